@@ -1,5 +1,6 @@
 import dlt
-from pageview_fetcher import get_pageviews
+from google.cloud import bigquery
+from pageview_fetcher import get_pageviews, update_pageview_rollup
 import argparse
 from datetime import datetime, timedelta
 
@@ -18,13 +19,25 @@ def run_pipeline(from_date=None, to_date=None):
             write_disposition="append"
             )
         print(f"Pipeline run completed: {load_info}")
+        # The scorer reads first 7 day totals from the rollup instead of aggregating the full pageview history
+        update_pageview_rollup(bigquery.Client(), from_date, to_date)
     except Exception as e:
         print(f"Error running pipeline: {e}")
 
+def run_rollup(from_date=None, to_date=None):
+    # Rebuilds the rollup from pageviews already in BigQuery, without loading any pageviews
+    print("Updating pageview rollup...")
+
+    try:
+        update_pageview_rollup(bigquery.Client(), from_date, to_date)
+    except Exception as e:
+        print(f"Error updating rollup: {e}")
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run full or partial page load to BigQuery.")
     parser.add_argument('--from_date', type=str, help='Start date (YYYY-MM-DD)')
     parser.add_argument('--to_date', type=str, help='End date (YYYY-MM-DD)')
+    parser.add_argument('--rollup_only', action='store_true', help='Only update the first 7 days rollup, e.g. to seed it')
     args = parser.parse_args()
 
     #defaults
@@ -41,5 +54,8 @@ if __name__ == "__main__":
     if from_date > to_date:
         raise ValueError("from_date cannot be after to_date")
     
-    run_pipeline(from_date=from_date_str, to_date=to_date_str)
+    if args.rollup_only:
+        run_rollup(from_date=from_date_str, to_date=to_date_str)
+    else:
+        run_pipeline(from_date=from_date_str, to_date=to_date_str)
     
\ No newline at end of file
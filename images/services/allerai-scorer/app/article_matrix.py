@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+PRECISIONS = ("float32", "float16", "int8")
+
+
+class ArticleMatrix:
+    def __init__(self, embeddings: np.ndarray, article_ids: np.ndarray, pageviews: np.ndarray,
+                 sites: np.ndarray, offsets: np.ndarray, scales: np.ndarray | None = None):
+        # Rows are grouped by site; rows of sites[i] live in [offsets[i], offsets[i + 1])
+        # Embeddings are float32 or float16 unit vectors, or int8 with the float32 scale of each row in scales
+        self.embeddings = embeddings
+        self.scales = scales
+        self.article_ids = article_ids
+        self.pageviews = pageviews
+        self.sites = sites
+        self.offsets = offsets
+
+        # Site segments padded to a (sites x widest site) grid so top-k runs without a loop over sites
+        counts = np.diff(offsets)
+        columns = np.arange(counts.max() if len(counts) else 0)
+        self.site_mask = columns < counts[:, None]
+        self.site_rows = np.where(self.site_mask, offsets[:-1, None] + columns, 0)
+
+        # The matrix is shared across requests, any in-place write is a bug
+        for array in (embeddings, article_ids, pageviews, sites, offsets, self.site_mask, self.site_rows):
+            array.flags.writeable = False
+        if scales is not None:
+            scales.flags.writeable = False
+
+    @classmethod
+    def from_dataframes(cls, df_articles: pd.DataFrame, precision: str = "float32") -> "ArticleMatrix":
+        df = df_articles[df_articles["embeddings_en"].notna()]
+
+        if "pageviews_first_7_days" not in df.columns:
+            df = df.assign(pageviews_first_7_days=np.nan)
+
+        df = df.sort_values("site_domain", kind="stable")
+
+        if df.empty:
+            embeddings = np.empty((0, 0), dtype=np.float32)
+        else:
+            embeddings = np.ascontiguousarray(np.vstack(df["embeddings_en"].to_numpy()), dtype=np.float32)
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+        embeddings, scales = quantize(embeddings, precision)
+
+        site_values = df["site_domain"].to_numpy()
+        sites, starts = np.unique(site_values, return_index=True)
+        offsets = np.append(starts, len(site_values)).astype(np.int64)
+
+        return cls(
+            embeddings=embeddings,
+            article_ids=df["article_id"].to_numpy(),
+            pageviews=pd.to_numeric(df["pageviews_first_7_days"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan),
+            sites=sites,
+            offsets=offsets,
+            scales=scales
+        )
+
+    @property
+    def empty(self) -> bool:
+        return len(self.article_ids) == 0
+
+    @property
+    def dim(self) -> int | None:
+        return self.embeddings.shape[1] if not self.empty else None
+
+    @property
+    def precision(self) -> str:
+        return self.embeddings.dtype.name
+
+    @property
+    def nbytes(self) -> int:
+        return self.embeddings.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def site_slices(self):
+        for i, site in enumerate(self.sites):
+            yield site, slice(self.offsets[i], self.offsets[i + 1])
+
+    def site_domains(self, rows: np.ndarray) -> np.ndarray:
+        return self.sites[np.searchsorted(self.offsets, rows, side="right") - 1]
+
+    def permuted(self, order: np.ndarray) -> "ArticleMatrix":
+        # Same articles in a new row order, order must keep every row inside its site's segment
+        return ArticleMatrix(
+            embeddings=np.ascontiguousarray(self.embeddings[order]),
+            article_ids=self.article_ids[order],
+            pageviews=self.pageviews[order],
+            sites=self.sites,
+            offsets=self.offsets,
+            scales=self.scales[order] if self.scales is not None else None
+        )
+
+    @staticmethod
+    def normalize(embeddings) -> np.ndarray:
+        queries = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=-1, keepdims=True)
+        return np.divide(queries, norms, out=np.zeros_like(queries), where=norms > 0)
+
+    def vectors(self, start: int = 0, stop: int | None = None) -> np.ndarray:
+        # Rows [start, stop) as float32, dequantized when the matrix is stored in lower precision
+        rows = self.embeddings[start:stop]
+        if rows.dtype == np.float32:
+            return rows
+        rows = rows.astype(np.float32)
+        if self.scales is not None:
+            rows *= self.scales[start:stop, None]
+        return rows
+
+    def similarities(self, embeddings, chunk_rows: int = 4096) -> np.ndarray:
+        # One event (dim,) gives (articles,), a batch (events, dim) gives (events, articles)
+        queries = self.normalize(embeddings)
+        if self.embeddings.dtype == np.float32:
+            return queries @ self.embeddings.T
+
+        # Dequantized one block of rows at a time, the float32 copy never exceeds chunk_rows rows
+        similarities = np.empty(queries.shape[:-1] + (len(self.embeddings),), dtype=np.float32)
+        for start in range(0, len(self.embeddings), chunk_rows):
+            stop = start + chunk_rows
+            block = queries @ self.embeddings[start:stop].astype(np.float32).T
+            if self.scales is not None:
+                block *= self.scales[start:stop]
+            similarities[..., start:stop] = block
+        return similarities
+
+    def site_top_k(self, scores: np.ndarray, k: int, valid: np.ndarray | None = None):
+        # Returns rows, scores and mask shaped (..., sites, k); mask is False where a site has fewer than k candidates
+        mask = self.site_mask if valid is None else self.site_mask & valid[self.site_rows]
+        padded = np.where(mask, scores[..., self.site_rows], -np.inf)
+        top = top_k_columns(padded, k)
+
+        rows = np.take_along_axis(np.broadcast_to(self.site_rows, padded.shape), top, axis=-1)
+        top_mask = np.take_along_axis(np.broadcast_to(mask, padded.shape), top, axis=-1)
+        return rows, np.take_along_axis(padded, top, axis=-1), top_mask
+
+
+def top_k_columns(padded: np.ndarray, k: int) -> np.ndarray:
+    # Column indices of the k largest values along the last axis, unordered; all columns when there are at most k
+    width = padded.shape[-1]
+    if k >= width:
+        return np.broadcast_to(np.arange(width), padded.shape)
+    return np.argpartition(padded, width - k, axis=-1)[..., width - k:]
+
+
+def quantize(embeddings: np.ndarray, precision: str) -> tuple:
+    # Returns the embeddings in the given precision and the per-row scales for int8 (None otherwise)
+    if precision == "float32":
+        return embeddings, None
+    if precision == "float16":
+        return embeddings.astype(np.float16), None
+    if precision == "int8":
+        scales = (np.abs(embeddings).max(axis=1) / 127 if embeddings.size else np.empty(0)).astype(np.float32)
+        safe_scales = np.where(scales > 0, scales, 1)[:, None]
+        return np.round(embeddings / safe_scales).astype(np.int8), scales
+    raise ValueError(f"Unknown embedding precision '{precision}', expected one of {PRECISIONS}")
@@ -7,3 +7,18 @@ PROJECT_ID = project_id
 OUTPUT_TOPIC = "allerai-scorer-events-push"
 OUTPUT_TOPIC_ERROR_LOG = "allerai-scorer-events-push-error-log"
 ADP_PROJECT_ID = os.getenv("TARGET_PROJECT_ID")
+SNAPSHOT_URI = os.getenv("SNAPSHOT_URI")
+ARTICLES_PER_SITE = int(os.getenv("ARTICLES_PER_SITE", "1000"))
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "flat")
+IVF_PROBES = int(os.getenv("IVF_PROBES", "8"))
+EMBEDDING_PRECISION = os.getenv("EMBEDDING_PRECISION", "float32")
+REFRESH_MODE = os.getenv("REFRESH_MODE", "full")
+FULL_REFRESH_INTERVAL_SECONDS = int(os.getenv("FULL_REFRESH_INTERVAL_SECONDS", "86400"))
+TAG_WORD_BOUNDARIES = os.getenv("TAG_WORD_BOUNDARIES", "false").lower() == "true"
+DOMAIN_SCORING_PATH = os.getenv("DOMAIN_SCORING_PATH")
+FEATURE_WORKERS = int(os.getenv("FEATURE_WORKERS", "4"))
+LOG_REQUEST_TIMINGS = os.getenv("LOG_REQUEST_TIMINGS", "false").lower() == "true"
+SUBSCRIPTION = os.getenv("SUBSCRIPTION")
+SUBSCRIBER_MAX_OUTSTANDING_MESSAGES = int(os.getenv("SUBSCRIBER_MAX_OUTSTANDING_MESSAGES", "200"))
+SUBSCRIBER_BATCH_SIZE = int(os.getenv("SUBSCRIBER_BATCH_SIZE", "50"))
+SUBSCRIBER_BATCH_INTERVAL_SECONDS = float(os.getenv("SUBSCRIBER_BATCH_INTERVAL_SECONDS", "0.1"))
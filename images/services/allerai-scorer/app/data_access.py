@@ -1,22 +1,69 @@
 import time
+import random
+import threading
+import logging
 import pandas as pd
 from google.cloud import bigquery
+from google.api_core.exceptions import NotFound
 import google.auth
 import traceback
 import numpy as np
+from article_matrix import ArticleMatrix, PRECISIONS
+from features.tag_matcher import TagMatcher
+from features.category_index import CategoryIndex
+from snapshot import CacheSnapshot, snapshot_store_from_uri
+from vector_index import VECTOR_INDEXES, FlatIndex, build_vector_index
+from dataclasses import replace
+import metrics
+
+logger = logging.getLogger(__name__)
+
+REFRESH_MODES = ("full", "incremental")
+# Pageviews count towards the first 7 days of an article, plus a day for pageviews loaded after midnight
+TRAFFIC_WINDOW_DAYS = 8
+# Rows can reach BigQuery after rows with a later timestamp, so incremental fetches start a little before the watermark
+WATERMARK_LOOKBACK = pd.Timedelta(minutes=30)
 
 class DataManager:
-    def __init__(self, adp_project_id, refresh_interval_seconds: int = 3600):
+    def __init__(self, adp_project_id, refresh_interval_seconds: int = 3600,
+                 retry_backoff_seconds: int = 30, max_retry_backoff_seconds: int = 900,
+                 snapshot_uri: str | None = None, articles_per_site: int = 1000, vector_index: str = "flat",
+                 ivf_probes: int = 8, embedding_precision: str = "float32", refresh_mode: str = "full",
+                 full_refresh_interval_seconds: int = 86400):
+        if vector_index not in VECTOR_INDEXES:
+            raise ValueError(f"Unknown vector index '{vector_index}', expected one of {VECTOR_INDEXES}")
+        if embedding_precision not in PRECISIONS:
+            raise ValueError(f"Unknown embedding precision '{embedding_precision}', expected one of {PRECISIONS}")
+        if refresh_mode not in REFRESH_MODES:
+            raise ValueError(f"Unknown refresh mode '{refresh_mode}', expected one of {REFRESH_MODES}")
         self.refresh_interval = refresh_interval_seconds
+        self.retry_backoff = retry_backoff_seconds
+        self.max_retry_backoff = max_retry_backoff_seconds
         credentials, self.project_id = google.auth.default()
         self.client = bigquery.Client()
         self.adp_project_id = adp_project_id
-        self._cached_articles: pd.DataFrame | None = None
-        self._cached_tag_scores: pd.DataFrame | None = None
-        self._cached_traffic_data: pd.DataFrame | None = None
-        self._last_refresh: float = 0
+        self.articles_per_site = int(articles_per_site)
+        self.vector_index = vector_index
+        self.ivf_probes = ivf_probes
+        self.embedding_precision = embedding_precision
+        self.refresh_mode = refresh_mode
+        self.full_refresh_interval = full_refresh_interval_seconds
+        self._snapshot: CacheSnapshot | None = None
+        self._refresh_lock = threading.Lock()
+        self._refresh_failures = 0
+        self._next_refresh_attempt: float = 0
+        self.snapshot_store = snapshot_store_from_uri(snapshot_uri)
+        self._persist_lock = threading.Lock()
+        self._persist_pending: CacheSnapshot | None = None
+        self._persist_thread: threading.Thread | None = None
+        metrics.CACHE_AGE.set_function(lambda: time.time() - self._snapshot.created_at if self._snapshot else float("nan"))
 
-    def _fetch_articles(self) -> pd.DataFrame:
+        if self.snapshot_store is not None:
+            self._load_persisted_snapshot()
+
+    def _fetch_articles(self, since: pd.Timestamp | None = None) -> pd.DataFrame:
+        # Only articles published or updated since the watermark when given
+        changed_filter = "AND (published_ts >= @since OR updated_ts >= @since)" if since is not None else ""
         sql = f"""
         WITH ranked_articles AS (
             SELECT 
@@ -26,10 +73,13 @@ class DataManager:
                 category,
                 sub_category,
                 text_embeddings_en as embeddings_en,
+                published_ts,
+                updated_ts,
                 ROW_NUMBER() OVER (PARTITION BY site_domain ORDER BY published_ts DESC) AS rn
             FROM `{self.adp_project_id}.editorial.pages`
             WHERE page_type = 'Article'
             AND text_embeddings_en IS NOT NULL
+            {changed_filter}
         )
         SELECT 
             article_id, 
@@ -37,11 +87,17 @@ class DataManager:
             main_category, 
             category, 
             sub_category, 
-            embeddings_en
+            embeddings_en,
+            published_ts,
+            updated_ts
         FROM ranked_articles
-        WHERE rn <= 1000
+        WHERE rn <= {self.articles_per_site}
         """
-        query_job = self.client.query(sql)
+        # Articles fetched again because of the lookback replace their cached copy in merge_article_ring
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ScalarQueryParameter("since", "TIMESTAMP", since - WATERMARK_LOOKBACK)]
+        ) if since is not None else None
+        query_job = self.client.query(sql, job_config=job_config)
         df = query_job.result().to_dataframe()
         df = self.validate_embeddings_column(df)
         return df
@@ -62,57 +118,250 @@ class DataManager:
         df = query_job.result().to_dataframe()
         return df
 
-    def _fetch_traffic_data(self) -> pd.DataFrame:
+    def _fetch_traffic_data(self, since: pd.Timestamp | None = None) -> pd.DataFrame:
+        # First 7 day totals are maintained by the pageview-fetcher job
+        try:
+            return self._query_traffic(f"""
+                SELECT page_id, site_domain, pageviews_first_7_days
+                FROM `{self.project_id}.adp_pageviews.pages_pageviews_first_7_days`
+            """, since)
+        except NotFound:
+            # The rollup only exists after the job's next run, until then the totals are aggregated from the history
+            logger.warning("pages_pageviews_first_7_days not found, aggregating first 7 day pageviews instead")
+            return self._query_traffic(f"""
+                SELECT
+                    pv.page_id,
+                    pv.site_domain,
+                    SUM(pageview_count) AS pageviews_first_7_days
+                FROM `{self.project_id}.adp_pageviews.pages_pageviews` pv
+                JOIN (
+                    SELECT page_id, published_ts
+                    FROM `{self.project_id}.adp_pages.pages`
+                ) p
+                ON
+                    pv.page_id = p.page_id
+                WHERE
+                    DATE(pv.event_date) BETWEEN DATE(p.published_ts) AND DATE_ADD(DATE(p.published_ts), INTERVAL 6 DAY)
+                GROUP BY
+                    pv.page_id, pv.site_domain
+            """, since)
+
+    def _query_traffic(self, traffic_sql: str, since: pd.Timestamp | None) -> pd.DataFrame:
+        # Only totals of the articles _fetch_articles selects, joined in SQL so the request doesn't grow with the cache
+        changed_filter = "AND (published_ts >= @since OR updated_ts >= @since)" if since is not None else ""
         sql = f"""
+        WITH cached_articles AS (
+            SELECT page_id
+            FROM (
+                SELECT
+                    page_id,
+                    ROW_NUMBER() OVER (PARTITION BY site_domain ORDER BY published_ts DESC) AS rn
+                FROM `{self.adp_project_id}.editorial.pages`
+                WHERE page_type = 'Article'
+                AND text_embeddings_en IS NOT NULL
+                {changed_filter}
+            )
+            WHERE rn <= {self.articles_per_site}
+        )
         SELECT
-            pv.page_id as article_id,
-            pv.site_domain,
-            SUM(pageview_count) AS pageviews_first_7_days
-        FROM `{self.project_id}.adp_pageviews.pages_pageviews` pv
-        JOIN (
-            SELECT page_id, published_ts
-            FROM `{self.project_id}.adp_pages.pages`
-        ) p
-        ON 
-            pv.page_id = p.page_id
-        WHERE 
-            DATE(pv.event_date) BETWEEN DATE(p.published_ts) AND DATE_ADD(DATE(p.published_ts), INTERVAL 6 DAY)
-        GROUP BY 
-            pv.page_id, pv.site_domain
+            t.page_id as article_id,
+            t.site_domain,
+            t.pageviews_first_7_days
+        FROM ({traffic_sql}) t
+        JOIN cached_articles a
+        ON t.page_id = a.page_id
         """
-        query_job = self.client.query(sql)
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ScalarQueryParameter("since", "TIMESTAMP", since)]
+        ) if since is not None else None
+        query_job = self.client.query(sql, job_config=job_config)
         df = query_job.result().to_dataframe()
         return df
 
     def refresh_cache(self) -> None:
+        started = time.perf_counter()
         try:
-            self._cached_articles = self._fetch_articles()
-            self._cached_tag_scores = self._fetch_tag_scores()
-            self._cached_traffic_data = self._fetch_traffic_data()
-            self._last_refresh = time.time()
+            previous = self._snapshot
+            if self._incremental_refresh_due(previous):
+                changed = self._fetch_articles(since=previous.watermark)
+                articles = self.merge_article_ring(self._cached_articles(previous), changed)
+                # Totals of articles past their first 7 days are final, only recent and changed articles are read again
+                since = min(previous.watermark - WATERMARK_LOOKBACK, pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=TRAFFIC_WINDOW_DAYS))
+                recent_traffic = self._fetch_traffic_data(since=since)
+                traffic_data = self._cached_traffic(previous.traffic, recent_traffic, articles)
+                # Tag scores have no change timestamp, they are only reloaded by the periodic full refresh
+                tag_scores, tag_matcher = previous.tag_scores, previous.tag_matcher
+                full_refresh_at, watermark = previous.full_refresh_at, self._watermark(changed, previous.watermark)
+                logger.info(f"Incremental refresh: {len(changed)} changed articles, {len(recent_traffic)} recent traffic rows")
+            else:
+                articles = self._fetch_articles()
+                tag_scores = self._fetch_tag_scores()
+                traffic_data = self._fetch_traffic_data()
+                tag_matcher = TagMatcher.from_dataframe(tag_scores)
+                full_refresh_at, watermark = time.time(), self._watermark(articles)
+
+            articles = articles.merge(
+                traffic_data[["article_id", "site_domain", "pageviews_first_7_days"]],
+                on=["article_id", "site_domain"],
+                how="left"
+            )
+
+            # Embeddings are only kept in the matrix, scorers read them from there; the index may reorder its rows
+            vector_index = build_vector_index(self.vector_index, ArticleMatrix.from_dataframes(articles, self.embedding_precision), self.ivf_probes)
+            snapshot = CacheSnapshot(
+                version=previous.version + 1 if previous is not None else 1,
+                created_at=time.time(),
+                articles=articles.drop(columns=["embeddings_en"]),
+                tag_scores=tag_scores,
+                traffic=traffic_data,
+                site_quartiles=self.compute_site_quartiles(articles),
+                article_matrix=vector_index.article_matrix,
+                tag_matcher=tag_matcher,
+                category_index=CategoryIndex.from_dataframe(articles),
+                vector_index=vector_index,
+                watermark=watermark,
+                full_refresh_at=full_refresh_at
+            )
+            self._snapshot = snapshot
+            metrics.CACHE_REFRESH_DURATION.set(time.perf_counter() - started)
+            self._record_snapshot_metrics(snapshot)
+            self._persist_snapshot(snapshot)
         except Exception:
+            metrics.CACHE_REFRESH_FAILURES.inc()
             traceback.print_exc()
             raise
 
-    def get_dataframes(self) -> dict[str, pd.DataFrame | None]:
+    def _incremental_refresh_due(self, previous: CacheSnapshot | None) -> bool:
+        if self.refresh_mode != "incremental" or previous is None or previous.watermark is None:
+            return False
+        # A full refresh now and then picks up tag scores and articles that were unpublished or lost their embedding
+        return time.time() - previous.full_refresh_at < self.full_refresh_interval
+
+    def _watermark(self, articles: pd.DataFrame, previous: pd.Timestamp | None = None) -> pd.Timestamp | None:
+        timestamps = pd.concat([articles["published_ts"], articles["updated_ts"]]).dropna()
+        if timestamps.empty:
+            return previous
+        latest = pd.Timestamp(timestamps.max())
+        return latest if previous is None else max(latest, previous)
+
+    def _cached_articles(self, snapshot: CacheSnapshot) -> pd.DataFrame:
+        # Articles of the snapshot with their embeddings taken back from the matrix, whatever order the index put them in
+        matrix = snapshot.article_matrix
+        rows = pd.MultiIndex.from_arrays([np.repeat(matrix.sites, np.diff(matrix.offsets)), matrix.article_ids]).get_indexer(
+            pd.MultiIndex.from_frame(snapshot.articles[["site_domain", "article_id"]])
+        )
+        vectors = matrix.vectors()
+        articles = snapshot.articles.drop(columns=["pageviews_first_7_days"])
+        articles["embeddings_en"] = [vectors[row] if row >= 0 else None for row in rows]
+        return articles
+
+    def _cached_traffic(self, cached: pd.DataFrame, fetched: pd.DataFrame, articles: pd.DataFrame) -> pd.DataFrame:
+        traffic = pd.concat([cached, fetched], ignore_index=True).drop_duplicates(subset=["article_id", "site_domain"], keep="last")
+        return traffic[traffic["article_id"].isin(articles["article_id"])].reset_index(drop=True)
+
+    def _record_snapshot_metrics(self, snapshot: CacheSnapshot) -> None:
+        frames = [snapshot.articles, snapshot.tag_scores, snapshot.traffic, snapshot.site_quartiles]
+        metrics.SNAPSHOT_ARTICLES.set(len(snapshot.article_matrix.article_ids))
+        metrics.SNAPSHOT_BYTES.set(
+            int(snapshot.article_matrix.nbytes + sum(df.memory_usage(deep=True).sum() for df in frames))
+        )
+
+    def _load_persisted_snapshot(self) -> None:
         try:
-            now = time.time()
-            if (self._cached_articles is None or self._cached_tag_scores is None or self._cached_traffic_data is None
-                    or (now - self._last_refresh) > self.refresh_interval):
-                self.refresh_cache()
-            return {
-                "articles": self._cached_articles.copy() if self._cached_articles is not None else None,
-                "tag_scores": self._cached_tag_scores.copy() if self._cached_tag_scores is not None else None,
-                "traffic": self._cached_traffic_data.copy() if self._cached_traffic_data is not None else None
-            }
+            snapshot = self.snapshot_store.load()
         except Exception:
-            traceback.print_exc()
-            raise
+            logger.warning("Could not load persisted snapshot, falling back to BigQuery", exc_info=True)
+            return
+        if snapshot is None:
+            return
+        # The persisted index is reused as is; a different kind is served exactly until the refresh below builds it
+        if snapshot.vector_index.kind != self.vector_index:
+            snapshot = replace(snapshot, vector_index=FlatIndex(snapshot.article_matrix))
+        elif snapshot.vector_index.kind == "ivf":
+            snapshot.vector_index.n_probe = self.ivf_probes
+
+        self._snapshot = snapshot
+        self._record_snapshot_metrics(snapshot)
+        logger.info(f"Loaded persisted snapshot version {snapshot.version}, revalidating in the background")
+        self._trigger_background_refresh()
+
+    def _persist_snapshot(self, snapshot: CacheSnapshot) -> None:
+        # Written in the background so neither the blocking first load nor the refresh lock wait for the upload
+        if self.snapshot_store is None:
+            return
+        self._persist_pending = snapshot
+        self._persist_thread = threading.Thread(target=self._write_pending_snapshot, name="snapshot-persist", daemon=True)
+        self._persist_thread.start()
+
+    def _write_pending_snapshot(self) -> None:
+        with self._persist_lock:
+            # Only the newest snapshot is written, an older write still running has already been superseded
+            snapshot, self._persist_pending = self._persist_pending, None
+            if snapshot is None:
+                return
+            try:
+                self.snapshot_store.save(snapshot)
+            except Exception:
+                logger.warning("Could not persist snapshot", exc_info=True)
+
+    def wait_for_persist(self, timeout: float | None = None) -> None:
+        thread = self._persist_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def get_snapshot(self) -> CacheSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Nothing to serve yet, the first load has to block
+            with self._refresh_lock:
+                if self._snapshot is None:
+                    self.refresh_cache()
+            return self._snapshot
+
+        if (time.time() - snapshot.created_at) > self.refresh_interval:
+            self._trigger_background_refresh()
+        return snapshot
+
+    def _trigger_background_refresh(self) -> None:
+        if time.time() < self._next_refresh_attempt:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # refresh already in flight
+        threading.Thread(target=self._background_refresh, name="cache-refresh", daemon=True).start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh_cache()
+            self._refresh_failures = 0
+            self._next_refresh_attempt = 0
+        except Exception:
+            self._refresh_failures += 1
+            backoff = min(self.max_retry_backoff, self.retry_backoff * 2 ** (self._refresh_failures - 1))
+            backoff *= random.uniform(0.5, 1.5)
+            self._next_refresh_attempt = time.time() + backoff
+            logger.warning(f"Cache refresh failed ({self._refresh_failures} in a row), serving stale snapshot, retrying in {backoff:.0f}s")
+        finally:
+            self._refresh_lock.release()
+
+    def compute_site_quartiles(self, df_articles: pd.DataFrame) -> pd.DataFrame:
+        df_articles = df_articles.dropna(subset=["pageviews_first_7_days"])
+        site_quartiles = df_articles.groupby("site_domain")["pageviews_first_7_days"].quantile([0.25, 0.5, 0.75]).unstack()
+        site_quartiles.columns = ["Q1", "Q2", "Q3"]
+        return site_quartiles
+
+    def merge_article_ring(self, cached: pd.DataFrame, changed: pd.DataFrame) -> pd.DataFrame:
+        # Changed articles replace their cached version, then each site keeps its latest articles_per_site
+        articles = pd.concat([cached, changed], ignore_index=True).drop_duplicates(
+            subset=["article_id", "site_domain"], keep="last"
+        )
+        articles = articles.sort_values("published_ts", ascending=False, kind="stable")
+        return articles.groupby("site_domain", sort=False).head(self.articles_per_site).reset_index(drop=True)
 
     def validate_embeddings_column(self, df: pd.DataFrame) -> pd.DataFrame:
         def safe_pass(x):
+            # BigQuery returns float64, halved here since the matrix is float32 or smaller anyway
             if isinstance(x, np.ndarray) and x.dtype in [np.float32, np.float64] and x.size > 0:
-                return x
+                return x.astype(np.float32, copy=False)
             return None
 
         df["embeddings_en"] = df["embeddings_en"].apply(safe_pass)
@@ -5,14 +5,19 @@ from features.similarity import SimilarityScorer
 from features.classification import ClassificationScorer
 from features.tags import TagScorer
 from features.potential import PotentialScorer
+from features.context import FeatureContext
 from scoring.scoring_weighted import Scorer
 from platform_push import platform_push
 from data_access import DataManager
 from parsers import RequestParser
 from pubsub import PubSubService
+from timing import StageTimer
+import metrics
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict
 import pandas as pd
 import numpy as np
+import orjson
 import logging
 import tldextract
 
@@ -20,92 +25,265 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 class EventHandler:
-    def __init__(self, project_id: str, output_topic: str, output_topic_error_log: str, adp_project_id: str):
-        self.data_manager = DataManager(adp_project_id)
+    def __init__(self, project_id: str, output_topic: str, output_topic_error_log: str, adp_project_id: str,
+                 snapshot_uri: str | None = None, scoring_config_path: str | None = None, feature_workers: int = 4,
+                 log_request_timings: bool = False, articles_per_site: int = 1000, vector_index: str = "flat",
+                 ivf_probes: int = 8, embedding_precision: str = "float32", refresh_mode: str = "full",
+                 full_refresh_interval_seconds: int = 86400, tag_word_boundaries: bool = False):
+        self.data_manager = DataManager(adp_project_id, snapshot_uri=snapshot_uri, articles_per_site=articles_per_site,
+                                        vector_index=vector_index, ivf_probes=ivf_probes,
+                                        embedding_precision=embedding_precision, refresh_mode=refresh_mode,
+                                        full_refresh_interval_seconds=full_refresh_interval_seconds)
         self.similarity_scorer = SimilarityScorer()
         self.classification_scorer = ClassificationScorer()
-        self.tag_scorer = TagScorer()
+        self.tag_scorer = TagScorer(word_boundaries=tag_word_boundaries)
         self.potential_scorer = PotentialScorer()
-        self.scorer = Scorer()
+        self.scorer = Scorer(scoring_config_path)
         self.request_parser = RequestParser()
-        self.pubsub_service = PubSubService(project_id, output_topic)
         self.pubsub_service_error_log = PubSubService(project_id, output_topic_error_log)
+        self.pubsub_service = PubSubService(project_id, output_topic, on_failure=self.publish_failed)
+        # Features and outbound I/O mostly release the GIL (BLAS, sockets), 1 or less runs everything inline
+        self.executor = ThreadPoolExecutor(feature_workers, thread_name_prefix="scorer") if feature_workers > 1 else None
+        self.log_request_timings = log_request_timings
 
     def process_request(self, request):
         payload = None
         message_id = None
         attributes = {}
 
+        timer = StageTimer()
+
         try:
-            payload, attributes, message_id = self.request_parser.parse_request(request)
+            with timer.stage("parse"):
+                payload, attributes, message_id = self.request_parser.parse_request(request)
 
-            if payload is None:
-                return jsonify({"status": "error", "reason": "Invalid JSON payload"}), 400
-        
-            df_event = self.request_parser.payload_to_df(payload)
-            site_value = df_event["site_domain"].iloc[0]
-            extracted = tldextract.extract(site_value)
-            base_domain = f"{extracted.domain}.{extracted.suffix}" if extracted.domain and extracted.suffix else None
-
-            # Get stored data
-            dfs = self.data_manager.get_dataframes()
-            df_articles = dfs["articles"]
-            df_tag_scores = dfs["tag_scores"]
-            df_traffic = dfs["traffic"]
-
-            df_articles = df_articles.merge(
-                df_traffic[['article_id', 'site_domain', 'pageviews_first_7_days']],
-                on=['article_id', 'site_domain'],
-                how='left'
-            )
+                if payload is None:
+                    self.record_timings(timer, "push", "invalid")
+                    return jsonify({"status": "error", "reason": "Invalid JSON payload"}), 400
+            
+                event = self.request_parser.payload_to_event(payload, self.data_manager.get_snapshot().article_matrix.dim)
+                base_domain = self.base_domain(event.site_domain)
 
             # Score event
-            logger.info(f"Scoring article_id: {df_event['article_id'].iloc[0]}, for domain: {base_domain}...")
-            potential_scores = self.potential_scorer.predict_classification(df_event, df_articles)
-            similarity_scores = self.similarity_scorer.embedding_relevance(df_event, df_articles)
-            classification_scores = self.classification_scorer.category_relevance(df_event, df_articles)
-            tag_scores = self.tag_scorer.tag_relevance(df_event, df_tag_scores)
-
-
-            # Combine scores and compute final weighted score
-            combined_scores = (
-                similarity_scores
-                .merge(classification_scores, on=["id", "site_domain"], how="inner")
-                .merge(tag_scores, on=["id", "site_domain"], how="left")
-            )
-
-            combined_scores["tag_score"] = combined_scores["tag_score"].fillna(0)
-
-            scores = self.scorer.compute_weighted_score(combined_scores)
-            final = scores.merge(
-                potential_scores[['id', 'site_domain', 'potential_quartile', 'pageview_range']],
-                on=['id', 'site_domain'],
-                how='left'
-            )
-
-            # Format final output
-
-            final["id"] = base_domain + ":" + final["id"].astype(str)
-            final["potential_quartile"] = final["potential_quartile"].fillna(1)
-            final['pageview_range'] = final['pageview_range'].apply(self.fill_nan_list)
+            logger.info(f"Scoring article_id: {event.article_id}, for domain: {base_domain}...")
+            final = self.score_events([event], [base_domain], timer)
 
             payload = final.to_dict(orient="records")
 
-            # Publish to Pub/Sub
-            self.pubsub_service.publish(payload, attributes)
-
-            # Push to AI Platform
-            platform_push(final)
+            # Publish to Pub/Sub and push to AI Platform
+            self.run_stages(timer, {
+                "pubsub_publish": lambda: self.pubsub_service.publish(payload, attributes),
+                "platform_push": lambda: platform_push(final)
+            })
 
-            logger.info(f"Published scores for article_id: {df_event['article_id'].iloc[0]}")
+            logger.info(f"Published scores for article_id: {event.article_id} ({timer.summary()})")
+            self.record_timings(timer, "push", "success", article_id=event.article_id)
             return jsonify({"status": "success"}), 200      
         
         except Exception as e:   
             logger.error(f"Error: {e}")         
             error_log = self.error_formatter(payload, message_id, e)            
             self.pubsub_service_error_log.publish(error_log, attributes)
+            self.record_timings(timer, "push", "error", article_id=error_log["article_id"])
             return jsonify({"error": str(e)}), 202
+
+    def process_batch(self, request):
+        try:
+            messages = self.request_parser.parse_batch_request(request)
+        except Exception as e:
+            logger.error(f"Error: {e}")
+            return jsonify({"status": "error", "reason": str(e)}), 400
+
+        timer = StageTimer()
+        try:
+            events = self.prepare_events(messages)
+        except Exception as e:
+            # Without a snapshot no message can be checked or scored
+            logger.error(f"Error: {e}")
+            for payload, attributes, message_id in messages:
+                self.publish_error(payload, attributes, message_id, e)
+            self.record_timings(timer, "batch", "error", events=len(messages))
+            return jsonify({"error": str(e), "scored": 0, "failed": len(messages)}), 202
+        if not events:
+            return jsonify({"status": "success", "scored": 0, "failed": len(messages)}), 200
+
+        failed = len(messages) - len(events)
+        try:
+            results = self.score_batch(events, timer)
+        except Exception as e:
+            logger.error(f"Error: {e}")
+            for payload, attributes, message_id in events.values():
+                self.publish_error(payload, attributes, message_id, e)
+            self.record_timings(timer, "batch", "error", events=len(events))
+            return jsonify({"error": str(e), "scored": 0, "failed": len(messages)}), 202
+
+        try:
+            _, push_error = self.publish_results(results, timer)
+        except Exception as e:
+            push_error = e
+        if push_error is not None:
+            logger.error(f"Error: {push_error}")
+            for key in results:
+                self.publish_error(*events[key], push_error)
+            self.record_timings(timer, "batch", "error", events=len(events))
+            return jsonify({"error": str(push_error), "scored": 0, "failed": len(messages)}), 202
+
+        logger.info(f"Published scores for {len(results)} events ({timer.summary()})")
+        self.record_timings(timer, "batch", "success", events=len(events))
+        return jsonify({"status": "success", "scored": len(results), "failed": failed}), 200
+
+    def publish_results(self, results: dict, timer: StageTimer) -> tuple:
+        # Publishes each event's rows and pushes all of them to the platform at once. Returns the publish futures by key
+        # and the push error, if any: a failed push must not undo publishes that went through
+        def publish_all():
+            return {
+                key: self.pubsub_service.publish(event_rows.to_dict(orient="records"), attributes)
+                for key, (event_rows, attributes) in results.items()
+            }
+
+        def push_all():
+            try:
+                if results:
+                    platform_push(pd.concat([event_rows for event_rows, _ in results.values()], ignore_index=True))
+            except Exception as e:
+                return e
+            return None
+
+        published = self.run_stages(timer, {
+            "pubsub_publish": publish_all,
+            "platform_push": push_all
+        })
+        return published["pubsub_publish"], published["platform_push"]
+
+    def prepare_events(self, messages: list) -> dict:
+        # Validates decoded messages, keyed by article_id; invalid ones go to the error log so they can't fail the batch
+        dim = self.data_manager.get_snapshot().article_matrix.dim
+        events = {}
+        for payload, attributes, message_id in messages:
+            try:
+                if isinstance(payload, Exception):
+                    raise payload
+                self.request_parser.validate_payload(payload, dim)
+                self.base_domain(payload["site_domain"])
+                key = str(payload["article_id"])
+                if key in events:
+                    # Only the latest message of an article is scored, the earlier one is reported like any dropped message
+                    logger.warning(f"Duplicate article_id {key} in batch, keeping the latest")
+                    duplicate = ValueError(f"Duplicate article_id {key} in batch, superseded by a later message")
+                    self.publish_error(*events[key], duplicate)
+                events[key] = (payload, attributes, message_id)
+            except Exception as e:
+                logger.error(f"Error: {e}")
+                self.publish_error(payload, attributes, message_id, e)
+        return events
+
+    def publish_error(self, payload, attributes: dict, message_id, e: Exception) -> None:
+        error_payload = payload if isinstance(payload, dict) else None
+        self.pubsub_service_error_log.publish(self.error_formatter(error_payload, message_id, e), attributes)
+
+    def score_batch(self, events: dict, timer: StageTimer | None = None) -> dict:
+        payloads = [payload for payload, _, _ in events.values()]
+        event_records = self.request_parser.payloads_to_events(payloads)
+        base_domains = [self.base_domain(event.site_domain) for event in event_records]
+
+        logger.info(f"Scoring {len(event_records)} events...")
+        final = self.score_events(event_records, base_domains, timer)
+
+        rows_by_event = dict(tuple(final.groupby("id", sort=False)))
+        output_ids = [f"{base_domain}:{key}" for base_domain, key in zip(base_domains, events)]
+        return {
+            key: (rows_by_event[output_id].reset_index(drop=True), attributes)
+            for output_id, (key, (_, attributes, _)) in zip(output_ids, events.items())
+            if output_id in rows_by_event
+        }
+
+    def score_events(self, events: list, base_domains: list, timer: StageTimer | None = None) -> pd.DataFrame:
+        timer = timer or StageTimer()
+
+        # Stored data and intermediates shared by the features, e.g. the event/article similarities or probed clusters
+        with timer.stage("snapshot"):
+            context = FeatureContext(events, self.data_manager.get_snapshot())
+        timer.timed("vector_search", lambda: context.snapshot.vector_index.prepare(context))
+
+        features = self.run_stages(timer, {
+            "potential": lambda: self.potential_scorer.predict_classification(context),
+            "similarity": lambda: self.similarity_scorer.embedding_relevance(context),
+            "classification": lambda: self.classification_scorer.category_relevance(context),
+            "tags": lambda: self.tag_scorer.tag_relevance(context)
+        })
+
+        # Combine scores and compute final weighted score
+        with timer.stage("combine"):
+            return self.combine_scores(events, base_domains, features)
+
+    def combine_scores(self, events: list, base_domains: list, features: dict) -> pd.DataFrame:
+        potential_scores = features["potential"]
+        similarity_scores = features["similarity"]
+        classification_scores = features["classification"]
+        tag_scores = features["tags"]
+
+        combined_scores = (
+            similarity_scores
+            .merge(classification_scores, on=["id", "site_domain"], how="inner")
+            .merge(tag_scores, on=["id", "site_domain"], how="left")
+        )
+
+        combined_scores["tag_score"] = combined_scores["tag_score"].fillna(0)
+
+        scores = self.scorer.compute_weighted_score(combined_scores)
+        final = scores.merge(
+            potential_scores[['id', 'site_domain', 'potential_quartile', 'pageview_range']],
+            on=['id', 'site_domain'],
+            how='left'
+        )
+
+        # Format final output
+        event_domains = dict(zip((event.article_id for event in events), base_domains))
+        final["id"] = final["id"].map(event_domains) + ":" + final["id"].astype(str)
+        final["potential_quartile"] = final["potential_quartile"].fillna(1)
+        final['pageview_range'] = final['pageview_range'].apply(self.fill_nan_list)
+
+        return final
+
+    def record_timings(self, timer: StageTimer, endpoint: str, status: str, events: int = 1, article_id=None) -> None:
+        metrics.observe_timer(timer, endpoint, status)
+        if not self.log_request_timings:
+            return
+        # One JSON line per request on stdout, picked up as a structured entry by Cloud Logging
+        print(orjson.dumps({
+            "severity": "INFO",
+            "message": f"{endpoint} request {status} in {timer.elapsed() * 1000:.1f}ms",
+            "endpoint": endpoint,
+            "status": status,
+            "article_id": article_id,
+            "events": events,
+            "stages_ms": {name: round(duration * 1000, 2) for name, duration in timer.durations.items()},
+            "total_ms": round(timer.elapsed() * 1000, 2)
+        }, default=str).decode(), flush=True)
+
+    def run_stages(self, timer: StageTimer, stages: dict) -> dict:
+        # Runs independent stages, concurrently when an executor is configured, and times each of them
+        if self.executor is None:
+            return {name: timer.timed(name, fn) for name, fn in stages.items()}
+        futures = {name: self.executor.submit(timer.timed, name, fn) for name, fn in stages.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    def base_domain(self, site_value: str) -> str:
+        extracted = tldextract.extract(site_value)
+        if not extracted.domain or not extracted.suffix:
+            raise ValueError(f"Could not resolve base domain for site_domain: {site_value}")
+        return f"{extracted.domain}.{extracted.suffix}"
     
+    def publish_failed(self, message: list, attributes: dict, e: Exception) -> None:
+        # Scores that could not be published end up in the error log like any other failed event
+        article_id = message[0].get("id") if isinstance(message, list) and message else None
+        error_log = {
+            "message_id": None,
+            "article_id": article_id,
+            "error": f"Publish failed: {e}"
+        }
+        self.pubsub_service_error_log.publish(error_log, attributes)
+
     def error_formatter(self, payload: Dict[str, Any], message_id: str, e: Exception) -> Dict[str, Any]:
         try:
             article_id = payload.get("article_id") if payload else None
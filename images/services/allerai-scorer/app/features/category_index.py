@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+LEVELS = ["main_category", "category", "sub_category"]
+
+
+class CategoryIndex:
+    # For each level, category value -> boolean mask over sites that have an article with that value
+    def __init__(self, sites: np.ndarray, level_sites: dict):
+        self.sites = sites
+        self.level_sites = level_sites
+
+    @classmethod
+    def from_dataframe(cls, df_articles: pd.DataFrame) -> "CategoryIndex":
+        sites = df_articles["site_domain"].unique()
+        site_positions = {site: i for i, site in enumerate(sites)}
+
+        level_sites = {}
+        for level in LEVELS:
+            pairs = df_articles[["site_domain", level]].dropna().drop_duplicates()
+            masks = {}
+            for site, value in zip(pairs["site_domain"], pairs[level]):
+                mask = masks.setdefault(value, np.zeros(len(sites), dtype=bool))
+                mask[site_positions[site]] = True
+            level_sites[level] = masks
+
+        return cls(np.asarray(sites, dtype=object), level_sites)
+
+    def matches(self, level: str, value) -> np.ndarray | None:
+        return self.level_sites[level].get(value)
@@ -0,0 +1,35 @@
+import threading
+import numpy as np
+
+
+class FeatureContext:
+    # Per-request inputs plus intermediates shared between features, each computed once on first use
+    def __init__(self, events: list, snapshot):
+        self.events = events
+        self.snapshot = snapshot
+        self._cache = {}
+        self._lock = threading.RLock()
+
+    def get(self, name: str, compute):
+        if name not in self._cache:
+            with self._lock:
+                if name not in self._cache:
+                    self._cache[name] = compute()
+        return self._cache[name]
+
+    @property
+    def event_ids(self) -> np.ndarray:
+        return self.get("event_ids", lambda: np.array([event.article_id for event in self.events], dtype=object))
+
+    @property
+    def queries(self) -> np.ndarray:
+        return self.get("queries", lambda: np.vstack([event.embedding for event in self.events]))
+
+    @property
+    def similarities(self) -> np.ndarray:
+        # Cosine similarity of every event against every cached article, (events, articles)
+        return self.get("similarities", lambda: self.snapshot.article_matrix.similarities(self.queries))
+
+    def site_top_k(self, k: int, valid: np.ndarray | None = None):
+        # Top k articles per site from the snapshot's vector index, see ArticleMatrix.site_top_k
+        return self.snapshot.vector_index.site_top_k(self, k, valid)
@@ -1,82 +1,74 @@
 import numpy as np
 import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
-import ast
+from features.context import FeatureContext
 
 class PotentialScorer:
 
-    def predict_classification(self, df_events, df_articles, N=25):
-        df_articles = df_articles.dropna(subset=['pageviews_first_7_days'])
+    def predict_classification(self, context: FeatureContext, N=25):
+        article_matrix = context.snapshot.article_matrix
         
-        site_quartiles = df_articles.groupby('site_domain')['pageviews_first_7_days'].quantile([0.25, 0.5, 0.75]).unstack()
-        site_quartiles.columns = ['Q1', 'Q2', 'Q3']
+        # Top N articles with traffic per site, as (events, sites, N) with a mask for sites having fewer
+        has_traffic = ~np.isnan(article_matrix.pageviews)
+        rows, _, mask = context.site_top_k(N, valid=has_traffic)
+        pageviews = np.where(mask, article_matrix.pageviews[rows], np.nan)
+        counts = mask.sum(axis=-1)
         
-        df_articles = df_articles.dropna(subset=["embeddings_en"]).copy()
-
-        article_embeddings = np.array(df_articles['embeddings_en'].tolist())
-        
-        all_predictions = []
+        quartiles = context.snapshot.site_quartiles.reindex(article_matrix.sites)[['Q1', 'Q2', 'Q3']].to_numpy(dtype=np.float64)
+        closest, q_ranges = self._classify(pageviews, counts, quartiles)
         
-        for _, event in df_events.iterrows():
-            new_embedding = np.array(event['embeddings_en']).reshape(1, -1)
-            similarities = cosine_similarity(new_embedding, article_embeddings).flatten()
-            
-            df_articles['similarity_score'] = similarities
-            top_similar = (
-                df_articles.sort_values(['site_domain', 'similarity_score'], ascending=[True, False])
-                .groupby('site_domain')
-                .head(N)
-            )
-            
-            predictions = self._classify_article(event['article_id'], top_similar, site_quartiles)
-            all_predictions.append(predictions)
+        # Sites without any article with traffic get no prediction
+        event_idx, site_idx = np.nonzero(counts > 0)
         
-        return pd.concat(all_predictions, ignore_index=True)
+        return pd.DataFrame({
+            'id': context.event_ids[event_idx],
+            'site_domain': article_matrix.sites[site_idx],
+            'potential_quartile': closest[event_idx, site_idx] + 1,  # 1-based index
+            'pageview_range': q_ranges[event_idx, site_idx].tolist()
+        })
     
-    def _classify_article(self, article_id, similar_articles, site_quartiles):
-        results = []
+    def _classify(self, pageviews, counts, quartiles):
+        std = self._std(pageviews, counts)[..., None]
+        median = self._median(pageviews, counts)[..., None]
+        calc = std - median * 2
+        
+        # Weighted pageviews, NaN padding fails every condition
+        conditions = [
+            pageviews > std,
+            (pageviews <= std) & (pageviews > calc),
+            pageviews <= calc
+        ]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weights = [cond.sum(axis=-1, keepdims=True) / counts[..., None] for cond in conditions]
+        
+        weighted_page_views = np.select(conditions, [pageviews * w for w in weights])
+        weighted_page_views[np.isnan(pageviews)] = np.nan
+        median_weighted = self._median(weighted_page_views, counts)
         
-        for site, site_articles in similar_articles.groupby('site_domain'):
-            std = site_articles['pageviews_first_7_days'].std()
-            median = site_articles['pageviews_first_7_days'].median()
-            calc = std - median * 2
-            
-            # Compute weighted pageviews vectorized
-            conditions = [
-                site_articles['pageviews_first_7_days'] > std,
-                (site_articles['pageviews_first_7_days'] <= std) & (site_articles['pageviews_first_7_days'] > calc),
-                site_articles['pageviews_first_7_days'] <= calc
-            ]
-            freqs = [cond.sum() for cond in conditions]
-            weights = [f / len(site_articles) for f in freqs]
-            
-            site_articles['weighted_page_views'] = np.select(
-                conditions,
-                [site_articles['pageviews_first_7_days'] * w for w in weights]
-            )
-            
-            median_weighted = site_articles['weighted_page_views'].median()
-            
-            # Determine closest quartile
-            Q1, Q2, Q3 = site_quartiles.loc[site]
-            quartile_diffs = [abs(median_weighted - Q1), abs(median_weighted - Q2), abs(median_weighted - Q3)]
-            closest = np.argmin(quartile_diffs) + 1  # 1-based index
-            
-            if closest == 1:
-                iq_dist = Q2 - Q1
-                q_range = [int(Q1 - 0.25 * iq_dist), int(Q1 + 0.25 * iq_dist)]
-            elif closest == 2:
-                iq_dist = Q3 - Q1
-                q_range = [int(Q2 - 0.25 * iq_dist), int(Q2 + 0.25 * iq_dist)]
-            else:
-                iq_dist = Q3 - Q2
-                q_range = [int(Q3 - 0.25 * iq_dist), int(Q3 + 0.25 * iq_dist)]
-            
-            results.append({
-                'id': article_id,
-                'site_domain': site,
-                'potential_quartile': closest,
-                'pageview_range': q_range
-            })
+        # Determine closest quartile
+        quartile_diffs = np.abs(median_weighted[..., None] - quartiles)
+        closest = np.argmin(quartile_diffs, axis=-1)
         
-        return pd.DataFrame(results)
+        Q1, Q2, Q3 = quartiles[:, 0], quartiles[:, 1], quartiles[:, 2]
+        centers = np.take_along_axis(np.broadcast_to(quartiles, closest.shape + (3,)), closest[..., None], axis=-1)[..., 0]
+        iq_dist = np.choose(closest, [
+            np.broadcast_to(Q2 - Q1, closest.shape),
+            np.broadcast_to(Q3 - Q1, closest.shape),
+            np.broadcast_to(Q3 - Q2, closest.shape)
+        ])
+        q_ranges = np.trunc(np.stack([centers - 0.25 * iq_dist, centers + 0.25 * iq_dist], axis=-1))
+        
+        return closest, np.nan_to_num(q_ranges).astype(np.int64)
+    
+    def _median(self, values, counts):
+        # Median of the first `counts` non-NaN values along the last axis (NaN sorts last)
+        ordered = np.sort(values, axis=-1)
+        lower = np.clip((counts - 1) // 2, 0, None)[..., None]
+        upper = np.clip(counts // 2, 0, values.shape[-1] - 1)[..., None]
+        return ((np.take_along_axis(ordered, lower, axis=-1) + np.take_along_axis(ordered, upper, axis=-1)) / 2)[..., 0]
+    
+    def _std(self, values, counts):
+        # Sample standard deviation (ddof=1) like pandas, NaN for fewer than two values
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.nansum(values, axis=-1) / counts
+            squared = np.nansum((values - mean[..., None]) ** 2, axis=-1)
+            return np.where(counts > 1, np.sqrt(squared / (counts - 1)), np.nan)
@@ -0,0 +1,103 @@
+from collections import deque
+import numpy as np
+import pandas as pd
+
+
+class TagMatcher:
+    # Aho-Corasick automaton over the lowercased tags of every site, built once per cache refresh
+    def __init__(self, tags: np.ndarray, row_sites: np.ndarray, row_scores: np.ndarray, sites: np.ndarray):
+        self.tags = tags
+        self.row_sites = row_sites
+        self.row_scores = row_scores
+        self.sites = sites
+
+        patterns = {}
+        for row, tag in enumerate(tags):
+            patterns.setdefault(tag, []).append(row)
+        self.patterns = list(patterns)
+        self.postings = [np.array(rows, dtype=np.int64) for rows in patterns.values()]
+
+        self._build(self.patterns)
+
+    @classmethod
+    def from_dataframe(cls, df_tag_scores: pd.DataFrame) -> "TagMatcher":
+        tags = df_tag_scores["tag"].astype(str).str.lower().to_numpy()
+        sites, row_sites = np.unique(df_tag_scores["site"].to_numpy(), return_inverse=True)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            row_scores = (
+                pd.to_numeric(df_tag_scores["frequency"]) / pd.to_numeric(df_tag_scores["max_frequency"])
+            ).to_numpy(dtype=np.float64, na_value=np.nan)
+        return cls(tags, row_sites, row_scores, sites)
+
+    def _build(self, patterns: list) -> None:
+        goto = [{}]
+        output = [[]]
+        self.always_matched = []
+
+        for pattern_id, pattern in enumerate(patterns):
+            if not pattern:
+                # "" is a substring of every text
+                self.always_matched.append(pattern_id)
+                continue
+            node = 0
+            for ch in pattern:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    output.append([])
+                node = nxt
+            output[node].append(pattern_id)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                state = fail[node]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                fail[nxt] = goto[state].get(ch, 0)
+                output[nxt] = output[nxt] + output[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._output = output
+
+    def match(self, text: str, word_boundaries: bool = False) -> set:
+        # Returns ids of patterns occurring in text; with word_boundaries a match must not touch letters or digits
+        goto, fail, output = self._goto, self._fail, self._output
+        matched = set(self.always_matched)
+        node = 0
+
+        for end, ch in enumerate(text, 1):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+
+            if output[node]:
+                if not word_boundaries:
+                    matched.update(output[node])
+                    continue
+                for pattern_id in output[node]:
+                    start = end - len(self.patterns[pattern_id])
+                    if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                        matched.add(pattern_id)
+
+        return matched
+
+    def site_matches(self, text: str, word_boundaries: bool = False) -> tuple:
+        # Per site (aligned to self.sites): max frequency/max_frequency of the matched tags, and the matched tags in table order
+        matched = self.match(text, word_boundaries)
+        rows = np.sort(np.concatenate([self.postings[p] for p in matched])) if matched else np.empty(0, dtype=np.int64)
+
+        scores = np.zeros(len(self.sites))
+        np.maximum.at(scores, self.row_sites[rows], self.row_scores[rows])
+
+        entities = [[] for _ in self.sites]
+        for row in rows:
+            entities[self.row_sites[row]].append(self.tags[row])
+
+        return scores, entities
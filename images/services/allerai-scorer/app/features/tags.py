@@ -1,41 +1,25 @@
+from features.context import FeatureContext
 import pandas as pd
-import re
+import numpy as np
 
 class TagScorer:
-    def __init__(self):
-        pass
+    def __init__(self, word_boundaries: bool = False):
+        self.word_boundaries = word_boundaries
 
-    def tag_relevance(self, df_event: pd.DataFrame, df_entities: pd.DataFrame) -> pd.DataFrame:
-        results = []
+    def tag_relevance(self, context: FeatureContext) -> pd.DataFrame:
+        tag_matcher = context.snapshot.tag_matcher
+        n_sites = len(tag_matcher.sites)
+        tag_scores = []
+        entities = []
 
-        df_entities = df_entities.copy()
-        df_entities["tag"] = df_entities["tag"].astype(str).str.lower()
-        bodytext = str(df_event.iloc[0]["bodytext_en"]).lower()
-        doc_id = df_event.iloc[0]["article_id"]
+        for event in context.events:
+            scores, matched_tags = tag_matcher.site_matches(str(event.bodytext_en).lower(), self.word_boundaries)
+            tag_scores.append(scores)
+            entities.extend(matched_tags)
 
-        for site, site_entities in df_entities.groupby("site"):
-            site_entities = site_entities.assign(
-                matched=site_entities["tag"].apply(lambda t: t in bodytext)
-            )
-
-            matched = site_entities[site_entities["matched"]]
-
-            if not matched.empty:
-                matched_tags = matched["tag"].tolist()
-                scores = (matched["frequency"] / matched["max_frequency"]).tolist()
-                results.append({
-                    "id": doc_id,
-                    "site_domain": site,
-                    "tag_score": max(scores),
-                    "entities": matched_tags
-                })
-            else:
-                results.append({
-                    "id": doc_id,
-                    "site_domain": site,
-                    "tag_score": 0.0,
-                    "entities": []
-                })
-
-        return pd.DataFrame(results)
-    
\ No newline at end of file
+        return pd.DataFrame({
+            "id": np.repeat(context.event_ids, n_sites),
+            "site_domain": np.tile(tag_matcher.sites, len(context.event_ids)),
+            "tag_score": np.concatenate(tag_scores) if tag_scores else np.empty(0),
+            "entities": entities
+        })
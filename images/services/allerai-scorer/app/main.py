@@ -1,10 +1,20 @@
-from flask import Request
+from flask import Request, Response
 import functions_framework
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from event_handler import EventHandler
-from config import PROJECT_ID, OUTPUT_TOPIC, OUTPUT_TOPIC_ERROR_LOG, ADP_PROJECT_ID
+from config import (PROJECT_ID, OUTPUT_TOPIC, OUTPUT_TOPIC_ERROR_LOG, ADP_PROJECT_ID, SNAPSHOT_URI, DOMAIN_SCORING_PATH,
+                    FEATURE_WORKERS, LOG_REQUEST_TIMINGS, ARTICLES_PER_SITE, VECTOR_INDEX, IVF_PROBES,
+                    EMBEDDING_PRECISION, REFRESH_MODE, FULL_REFRESH_INTERVAL_SECONDS, TAG_WORD_BOUNDARIES)
 
-handler = EventHandler(PROJECT_ID, OUTPUT_TOPIC, OUTPUT_TOPIC_ERROR_LOG, ADP_PROJECT_ID)
+handler = EventHandler(PROJECT_ID, OUTPUT_TOPIC, OUTPUT_TOPIC_ERROR_LOG, ADP_PROJECT_ID, SNAPSHOT_URI, DOMAIN_SCORING_PATH,
+                       FEATURE_WORKERS, LOG_REQUEST_TIMINGS, ARTICLES_PER_SITE, VECTOR_INDEX, IVF_PROBES,
+                       EMBEDDING_PRECISION, REFRESH_MODE, FULL_REFRESH_INTERVAL_SECONDS, TAG_WORD_BOUNDARIES)
 
 @functions_framework.http
 def process_request(request: Request):
+    path = request.path.rstrip("/")
+    if request.method == "GET" and path.endswith("/metrics"):
+        return Response(generate_latest(), content_type=CONTENT_TYPE_LATEST)
+    if path.endswith("/batch"):
+        return handler.process_batch(request)
     return handler.process_request(request)
@@ -0,0 +1,24 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_DURATION = Histogram(
+    "scorer_stage_duration_seconds", "Duration of each scoring stage.", ["endpoint", "stage"], buckets=BUCKETS
+)
+REQUEST_DURATION = Histogram(
+    "scorer_request_duration_seconds", "End-to-end duration of scoring requests.", ["endpoint", "status"], buckets=BUCKETS
+)
+PUBSUB_MESSAGES = Counter(
+    "scorer_pubsub_messages_total", "Pub/Sub publishes by topic and outcome.", ["topic", "result"]
+)
+CACHE_AGE = Gauge("scorer_cache_age_seconds", "Age of the reference data snapshot being served.")
+CACHE_REFRESH_DURATION = Gauge("scorer_cache_refresh_duration_seconds", "Duration of the last successful cache refresh.")
+CACHE_REFRESH_FAILURES = Counter("scorer_cache_refresh_failures_total", "Failed cache refreshes.")
+SNAPSHOT_ARTICLES = Gauge("scorer_snapshot_articles", "Articles with embeddings in the served snapshot.")
+SNAPSHOT_BYTES = Gauge("scorer_snapshot_bytes", "Approximate in-memory size of the served snapshot.")
+
+
+def observe_timer(timer, endpoint: str, status: str) -> None:
+    for stage, duration in timer.durations.items():
+        STAGE_DURATION.labels(endpoint=endpoint, stage=stage).observe(duration)
+    REQUEST_DURATION.labels(endpoint=endpoint, status=status).observe(timer.elapsed())
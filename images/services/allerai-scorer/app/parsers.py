@@ -1,18 +1,56 @@
-import json
+from dataclasses import dataclass
 import base64
-import pandas as pd
+import orjson
 import numpy as np
 
+
+@dataclass(slots=True)
+class Event:
+    article_id: object
+    site_domain: str
+    embedding: np.ndarray
+    main_category: str | None = None
+    category: str | None = None
+    sub_category: str | None = None
+    bodytext_en: str = ""
+
+
 class RequestParser:
     def __init__(self):
         pass
 
     def parse_request(self, request) -> tuple:
-        envelope = request.get_json()
+        envelope = self.parse_body(request)
         if not envelope or "message" not in envelope:
             raise ValueError("No Pub/Sub message received")
 
-        message = envelope["message"]
+        return self.decode_message(envelope["message"])
+
+    def parse_batch_request(self, request) -> list:
+        # Body is {"messages": [<Pub/Sub message>, ...]}; messages that fail to decode are returned with the exception as payload
+        envelope = self.parse_body(request)
+        if not envelope or not isinstance(envelope.get("messages"), list):
+            raise ValueError("No Pub/Sub messages received")
+
+        decoded = []
+        for message in envelope["messages"]:
+            try:
+                decoded.append(self.decode_message(message))
+            except ValueError as e:
+                message = message if isinstance(message, dict) else {}
+                decoded.append((e, message.get("attributes", {}), message.get("messageId") or None))
+        return decoded
+
+    def parse_body(self, request) -> dict | None:
+        try:
+            envelope = orjson.loads(request.get_data(cache=False))
+        except orjson.JSONDecodeError:
+            return None
+        return envelope if isinstance(envelope, dict) else None
+
+    def decode_message(self, message: dict) -> tuple:
+        if not isinstance(message, dict):
+            raise ValueError("Pub/Sub message must be a JSON object")
         attributes = message.get("attributes", {})
         message_id = message.get("messageId") or None
 
@@ -20,20 +58,44 @@ class RequestParser:
         if not data:
             raise ValueError("No data in Pub/Sub message")
 
+        return self.decode_data(base64.b64decode(data)), attributes, message_id
+
+    def decode_data(self, data: bytes) -> dict:
+        # Raw message data, as delivered by a pull subscription
         try:
-            payload = json.loads(base64.b64decode(data).decode("utf-8"))
-        except json.JSONDecodeError as e:
+            payload = orjson.loads(data)
+        except orjson.JSONDecodeError as e:
             raise ValueError(f"JSON decoding error: {e}")
+        if not isinstance(payload, dict):
+            raise ValueError("Message data must be a JSON object")
 
-        final_payload = payload.get("merged_payload", {})
-
-        return final_payload, attributes, message_id
+        return payload.get("merged_payload", {})
 
-    def payload_to_df(self, payload: dict) -> pd.DataFrame:
+    def validate_payload(self, payload: dict, dim: int | None = None) -> np.ndarray:
+        # Returns the event embedding as float32, anything but a flat non-empty list of numbers is rejected,
+        # as is an embedding of another dimension than the cached articles when dim is given
         if not isinstance(payload, dict):
             raise ValueError("Payload must be a dictionary.")
         emb = payload.get("embeddings_en")
-        if not isinstance(emb, list) or not emb or not all(isinstance(x, (float, int)) for x in emb):
-            raise ValueError("Event embedding is missing or invalid.")
-        payload["embeddings_en"] = np.array(emb, dtype=np.float32)
-        return pd.DataFrame([payload])
+        if isinstance(emb, list) and emb:
+            values = np.asarray(emb)
+            if values.ndim == 1 and values.dtype.kind in "iuf":
+                if dim is not None and len(values) != dim:
+                    raise ValueError(f"Event embedding has {len(values)} dimensions, expected {dim}.")
+                return values.astype(np.float32)
+        raise ValueError("Event embedding is missing or invalid.")
+
+    def payload_to_event(self, payload: dict, dim: int | None = None) -> Event:
+        embedding = self.validate_payload(payload, dim)
+        return Event(
+            article_id=payload.get("article_id"),
+            site_domain=payload.get("site_domain"),
+            embedding=embedding,
+            main_category=payload.get("main_category"),
+            category=payload.get("category"),
+            sub_category=payload.get("sub_category"),
+            bodytext_en=payload.get("bodytext_en") or ""
+        )
+
+    def payloads_to_events(self, payloads: list) -> list:
+        return [self.payload_to_event(payload) for payload in payloads]
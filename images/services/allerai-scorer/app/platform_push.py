@@ -1,58 +1,203 @@
+import orjson
+import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import atexit
 import os
+import queue
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
 API_KEY = os.getenv("PLATFORM_API_KEY", "API_KEY not set")
 ENDPOINT = os.getenv("PLATFORM_ENDPOINT", "PLATFORM_ENDPOINT not set")
+# 0 sends every push synchronously, otherwise rows are queued and sent in batches at most this often
+BATCH_INTERVAL_SECONDS = float(os.getenv("PLATFORM_BATCH_INTERVAL_SECONDS", "0"))
 
-def platform_push(payload):
-    headers = {
-        "Content-Type": "application/json; charset=UTF-8",
-        "x-api-key": API_KEY
-    }
-
-    transformed = payload.apply(transform_row, axis=1).tolist()
-
-    # Temporary filter as platform does not accept these sites
-    supported_sites = [
-        "allas.se",
-        "billedbladet.dk",
-        "dagbladet.no",
-        "elbil24.no",
-        "elle.se",
-        "femina.dk",
-        "femina.se",
-        "hant.se",
-        "isabellas.dk",
-        "kk.no",
-        "mabra.com",
-        "residencemagazine.se",
-        "seher.no",
-        "seiska.fi",
-        "seoghoer.dk",
-        "sol.no",
-        "vielskerserier.dk"
-    ]
-    filtered_payload = [
-        row for row in transformed
-        if row["audience_site"] in supported_sites
-    ]
+# Temporary filter as platform does not accept these sites
+SUPPORTED_SITES = frozenset([
+    "allas.se",
+    "billedbladet.dk",
+    "dagbladet.no",
+    "elbil24.no",
+    "elle.se",
+    "femina.dk",
+    "femina.se",
+    "hant.se",
+    "isabellas.dk",
+    "kk.no",
+    "mabra.com",
+    "residencemagazine.se",
+    "seher.no",
+    "seiska.fi",
+    "seoghoer.dk",
+    "sol.no",
+    "vielskerserier.dk"
+])
+
+
+class PlatformUnavailableError(Exception):
+    pass
+
+
+class PlatformClient:
+    def __init__(self, endpoint: str, api_key: str, timeout: tuple = (3.05, 10), retries: int = 3,
+                 backoff_factor: float = 0.5, failure_threshold: int = 5, reset_timeout_seconds: float = 30,
+                 batch_interval_seconds: float = 0, max_batch_rows: int = 500):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout_seconds
+        self.batch_interval = batch_interval_seconds
+        self.max_batch_rows = max_batch_rows
+
+        # Keep-alive connections reused across requests, retried with exponential backoff on 429/5xx
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["POST"],
+            raise_on_status=False
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=10, max_retries=retry))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=10, max_retries=retry))
+        self.session.headers.update({
+            "Content-Type": "application/json; charset=UTF-8",
+            "x-api-key": api_key
+        })
+
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+        self._probing = False
+
+        self._queue = None
+        if batch_interval_seconds > 0:
+            self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._drain_queue, name="platform-push", daemon=True)
+            self._worker.start()
+            atexit.register(self.flush)
+
+    def push(self, rows: list) -> None:
+        if not rows:
+            return
+        if self._queue is not None:
+            self._queue.put(rows)
+        else:
+            self.send(rows)
+
+    def send(self, rows: list) -> requests.Response:
+        body = orjson.dumps(rows, option=orjson.OPT_SERIALIZE_NUMPY)
+        probe = self._acquire()
+
+        success = False
+        try:
+            response = self.session.post(self.endpoint, data=body, timeout=self.timeout)
+            success = response.status_code < 500
+        finally:
+            self._record_result(success, probe)
+
+        logger.info(f"AI Platform Status Code: {response.status_code}")
+        logger.info(f"AI Platform Response Content: {response.content.decode('utf-8')}")
+        return response
 
-    response = requests.post(ENDPOINT, json=filtered_payload, headers=headers)
-    logger.info(f"AI Platform Status Code: {response.status_code}")
-    logger.info(f"AI Platform Response Content: {response.content.decode('utf-8')}")
-
-def transform_row(row):
-    return {
-        "id": row["id"],
-        "entities": [{"type": "PERSON", "name": e} for e in row["entities"]],
-        "pageview_range": {
-            "min": row["pageview_range"][0],
-            "max": row["pageview_range"][1]
-        },
-        "potential_quartile": str(int(row["potential_quartile"])),
-        "relevance": row["score"],
-        "audience_site": row["site_domain"]
-    }
+    def flush(self, timeout: float | None = None) -> None:
+        if self._queue is None:
+            return
+        self._queue.put(None)
+        self._worker.join(timeout)
+
+    def _acquire(self) -> bool:
+        # Fails fast while the circuit is open instead of waiting on an endpoint that is known to be down;
+        # once the reset timeout has passed a single request probes it (half-open), returns whether this is the probe
+        with self._lock:
+            if self._consecutive_failures < self.failure_threshold:
+                return False
+            if self._probing or time.monotonic() < self._open_until:
+                raise PlatformUnavailableError("AI Platform circuit is open, skipping push")
+            self._probing = True
+            return True
+
+    def _record_result(self, success: bool, probe: bool = False) -> None:
+        with self._lock:
+            if probe:
+                self._probing = False
+            if success:
+                self._consecutive_failures = 0
+                return
+            self._consecutive_failures += 1
+            # A failed probe, or reaching the threshold, opens the circuit for another reset timeout
+            if probe or self._consecutive_failures >= self.failure_threshold:
+                self._open_until = time.monotonic() + self.reset_timeout
+                logger.warning(f"AI Platform failed {self._consecutive_failures} times in a row, "
+                               f"pausing pushes for {self.reset_timeout:g}s")
+
+    def _drain_queue(self) -> None:
+        stopping = False
+        while not stopping:
+            rows = self._queue.get()
+            if rows is None:
+                break
+
+            # Collect whatever else arrives within the interval into the same POST
+            batch = list(rows)
+            deadline = time.monotonic() + self.batch_interval
+            while len(batch) < self.max_batch_rows:
+                try:
+                    rows = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if rows is None:
+                    stopping = True
+                    break
+                batch.extend(rows)
+
+            try:
+                self.send(batch)
+            except Exception as e:
+                logger.error(f"AI Platform push of {len(batch)} rows failed: {e}")
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> PlatformClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = PlatformClient(ENDPOINT, API_KEY, batch_interval_seconds=BATCH_INTERVAL_SECONDS)
+    return _client
+
+
+def platform_push(payload: pd.DataFrame):
+    supported = payload[payload["site_domain"].isin(SUPPORTED_SITES)]
+    get_client().push(transform_rows(supported))
+
+def transform_rows(df: pd.DataFrame) -> list:
+    return [
+        {
+            "id": row_id,
+            "entities": [{"type": "PERSON", "name": e} for e in entities],
+            "pageview_range": {
+                "min": pageview_range[0],
+                "max": pageview_range[1]
+            },
+            "potential_quartile": potential_quartile,
+            "relevance": score,
+            "audience_site": site
+        }
+        for row_id, entities, pageview_range, potential_quartile, score, site in zip(
+            df["id"].tolist(),
+            df["entities"].tolist(),
+            df["pageview_range"].tolist(),
+            df["potential_quartile"].astype(int).astype(str).tolist(),
+            df["score"].tolist(),
+            df["site_domain"].tolist()
+        )
+    ]
@@ -1,11 +1,84 @@
-import json
+import atexit
+import logging
+import os
+import threading
+from concurrent import futures
+import orjson
 from google.cloud import pubsub_v1
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# A batch is sent as soon as any of these is reached
+MAX_MESSAGES = int(os.getenv("PUBSUB_MAX_MESSAGES", "100"))
+MAX_BYTES = int(os.getenv("PUBSUB_MAX_BYTES", "1000000"))
+MAX_LATENCY_SECONDS = float(os.getenv("PUBSUB_MAX_LATENCY_SECONDS", "0.01"))
+# publish() blocks once this much is waiting to be sent
+MAX_OUTSTANDING_MESSAGES = int(os.getenv("PUBSUB_MAX_OUTSTANDING_MESSAGES", "1000"))
+MAX_OUTSTANDING_BYTES = int(os.getenv("PUBSUB_MAX_OUTSTANDING_BYTES", "10000000"))
 
 class PubSubService:
-    def __init__(self, project_id: str, output_topic: str):
-        self.publisher = pubsub_v1.PublisherClient()
+    def __init__(self, project_id: str, output_topic: str, max_messages: int = MAX_MESSAGES,
+                 max_bytes: int = MAX_BYTES, max_latency_seconds: float = MAX_LATENCY_SECONDS,
+                 max_outstanding_messages: int = MAX_OUTSTANDING_MESSAGES,
+                 max_outstanding_bytes: int = MAX_OUTSTANDING_BYTES, on_failure=None):
+        self.publisher = pubsub_v1.PublisherClient(
+            batch_settings=pubsub_v1.types.BatchSettings(
+                max_messages=max_messages,
+                max_bytes=max_bytes,
+                max_latency=max_latency_seconds
+            ),
+            publisher_options=pubsub_v1.types.PublisherOptions(
+                flow_control=pubsub_v1.types.PublishFlowControl(
+                    message_limit=max_outstanding_messages,
+                    byte_limit=max_outstanding_bytes,
+                    limit_exceeded_behavior=pubsub_v1.types.LimitExceededBehavior.BLOCK
+                )
+            )
+        )
         self.topic_path = self.publisher.topic_path(project_id, output_topic)
+        self.topic = output_topic
+        self.on_failure = on_failure
+
+        self.published_count = 0
+        self.failed_count = 0
+        self._pending = set()
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
 
     def publish(self, message_dict: dict, attributes: dict):
-        message_bytes = json.dumps(message_dict).encode('utf-8')
-        self.publisher.publish(self.topic_path, message_bytes, **(attributes or {}))
+        message_bytes = orjson.dumps(message_dict, option=orjson.OPT_SERIALIZE_NUMPY)
+        future = self.publisher.publish(self.topic_path, message_bytes, **(attributes or {}))
+
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(lambda f: self._on_published(f, message_dict, attributes))
+        return future
+
+    def flush(self, timeout: float | None = 30) -> None:
+        # Waits for every outstanding publish, used on shutdown so no scored event is lost
+        with self._lock:
+            pending = list(self._pending)
+        if pending:
+            futures.wait(pending, timeout=timeout)
+
+    def _on_published(self, future, message_dict, attributes) -> None:
+        with self._lock:
+            self._pending.discard(future)
+
+        error = future.exception()
+        if error is None:
+            with self._lock:
+                self.published_count += 1
+            metrics.PUBSUB_MESSAGES.labels(topic=self.topic, result="published").inc()
+            return
+
+        with self._lock:
+            self.failed_count += 1
+        metrics.PUBSUB_MESSAGES.labels(topic=self.topic, result="failed").inc()
+        logger.error(f"Publish to {self.topic_path} failed: {error}")
+        if self.on_failure is not None:
+            try:
+                self.on_failure(message_dict, attributes, error)
+            except Exception:
+                logger.exception("Publish failure handler raised")
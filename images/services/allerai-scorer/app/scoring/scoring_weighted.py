@@ -1,71 +1,140 @@
 import pandas as pd
+import numpy as np
 import yaml
+from dataclasses import dataclass
 from pathlib import Path
+import hashlib
+import threading
+import time
 import logging
 import traceback
 
 logger = logging.getLogger()  # root logger
 logging.basicConfig(level=logging.INFO)
 
+@dataclass(frozen=True)
+class CompiledWeights:
+    version: str
+    features: list
+    domain_index: dict
+    weights: np.ndarray
+
+
 class Scorer:
-    def __init__(self, config_path: str = None, normalize: bool = True):
+    def __init__(self, config_path: str = None, normalize: bool = True, reload_interval_seconds: float = 30):
         if config_path is None:
             config_path = Path(__file__).resolve().parent.parent / "models" / "domain_scoring.yaml"
-        with open(config_path) as f:
-            self.config = yaml.safe_load(f)
+        self.config_path = Path(config_path)
         self.normalize = normalize
+        self.reload_interval = reload_interval_seconds
+        self._reload_lock = threading.Lock()
+        self._last_reload_check = time.monotonic()
+        self._load_config()
+
+    def _load_config(self) -> None:
+        mtime = self.config_path.stat().st_mtime_ns
+        raw = self.config_path.read_bytes()
+        config = yaml.safe_load(raw)
+        compiled = self._compile(config, hashlib.sha1(raw).hexdigest()[:12])
+
+        # Swapped as whole objects, a request never sees a half-updated table
+        self.config = config
+        self.compiled = compiled
+        self._config_mtime = mtime
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now - self._last_reload_check < self.reload_interval:
+            return
+        self._last_reload_check = now
+
+        try:
+            if self.config_path.stat().st_mtime_ns == self._config_mtime:
+                return
+        except OSError:
+            return
+
+        if not self._reload_lock.acquire(blocking=False):
+            return  # reload already in flight
+        threading.Thread(target=self._reload_config, name="scoring-config-reload", daemon=True).start()
+
+    def _reload_config(self) -> None:
+        try:
+            previous_version = self.compiled.version
+            self._load_config()
+            logger.info(f"Reloaded {self.config_path}: version {previous_version} -> {self.compiled.version}")
+        except Exception:
+            logger.warning(f"Could not reload {self.config_path}, keeping version {self.compiled.version}", exc_info=True)
+        finally:
+            self._reload_lock.release()
+
+    def _compile(self, config: dict, version: str) -> CompiledWeights:
+        # Dense (domain x feature) weight tables; weighted rows are normalized up front
+        if not isinstance(config, dict) or "default" not in config:
+            raise ValueError("Domain scoring config must define a 'default' section")
+        domain_weights = {domain: self._resolve_weights(domain_config) for domain, domain_config in config.items()}
+        features = list(dict.fromkeys(f for weights in domain_weights.values() for f in weights))
+
+        weighted = np.zeros((len(domain_weights), len(features)))
+        additive = np.zeros((len(domain_weights), len(features)))
+
+        for i, weights in enumerate(domain_weights.values()):
+            for feature, feature_config in weights.items():
+                if isinstance(feature_config, dict):
+                    f_type = feature_config.get("type", "weighted")
+                    f_value = feature_config.get("value", 0.0)
+                else:
+                    f_type = "weighted"
+                    f_value = feature_config
+
+                if f_type == "weighted":
+                    weighted[i, features.index(feature)] = f_value
+                elif f_type == "additive":
+                    additive[i, features.index(feature)] += f_value
+
+            total_weight = weighted[i].sum()
+            if self.normalize and total_weight > 0:
+                weighted[i] /= total_weight
+
+        return CompiledWeights(
+            version=version,
+            features=features,
+            domain_index={domain: i for i, domain in enumerate(domain_weights)},
+            weights=weighted + additive
+        )
+
+    def _resolve_weights(self, domain_config: dict) -> dict:
+        # Handle YAML with versioning
+        if all(k.startswith("v") for k in domain_config.keys()):
+            latest_version = list(domain_config.keys())[-1]
+            return domain_config[latest_version]
+        return domain_config
 
     def compute_weighted_score(self, df: pd.DataFrame) -> pd.DataFrame:
+        self._maybe_reload()
+        compiled = self.compiled
+
         try:
             df["entities"] = df["entities"].apply(lambda x: x if isinstance(x, list) else [])
-            numeric_features = ["embedding_similarity", "category_similarity", "tag_score"]
-            df[numeric_features] = df[numeric_features].apply(pd.to_numeric, errors='coerce').fillna(0.0)
 
-            results = []
+            feature_values = np.column_stack([
+                pd.to_numeric(df[f], errors="coerce").fillna(0.0).to_numpy(dtype=float) if f in df.columns
+                else np.zeros(len(df))
+                for f in compiled.features
+            ]) if compiled.features else np.zeros((len(df), 0))
 
-            for _, row in df.iterrows():
-                domain_config = self.config.get(row["site_domain"], self.config["default"])
+            rows = df["site_domain"].map(compiled.domain_index).fillna(compiled.domain_index["default"]).to_numpy(dtype=int)
+            score = np.minimum((feature_values * compiled.weights[rows]).sum(axis=1), 1.0)
+
+            return pd.DataFrame({
+                "id": df["id"].to_numpy(),
+                "site_domain": df["site_domain"].to_numpy(),
+                "score": score,
+                "entities": df["entities"].to_numpy(),
+                "config_version": compiled.version
+            })
 
-                # Handle YAML with versioning
-                if all(k.startswith("v") for k in domain_config.keys()):
-                    latest_version = list(domain_config.keys())[-1]
-                    weights = domain_config[latest_version]
-                else:
-                    weights = domain_config
-
-                weighted_features = {}
-                additive_bonus = 0.0
-
-                for feature, config in weights.items():
-                    if isinstance(config, dict):
-                        f_type = config.get("type", "weighted")
-                        f_value = config.get("value", 0.0)
-                    else:
-                        f_type = "weighted"
-                        f_value = config
-
-                    if f_type == "weighted":
-                        weighted_features[feature] = (f_value)
-                    elif f_type == "additive":
-                        additive_bonus += row.get(feature, 0.0) * f_value
-
-                total_weight = sum(weighted_features.values())
-                if self.normalize and total_weight > 0:
-                    weighted_features = {k: v / total_weight for k, v in weighted_features.items()}
-
-                score = sum(row.get(f, 0.0) * w for f, w in weighted_features.items())
-                score = min(score + additive_bonus, 1.0)
-
-                results.append({
-                    "id": row["id"],
-                    "site_domain": row["site_domain"],
-                    "score": score,
-                    "entities": row.get("entities", [])
-                })
-
-            return pd.DataFrame(results)
-        
         except Exception as e:
             logger.error("Exception in compute_weighted_score: %s", e)
             logger.error(traceback.format_exc())
-            raise
\ No newline at end of file
+            raise
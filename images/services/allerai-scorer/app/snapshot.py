@@ -0,0 +1,210 @@
+from dataclasses import dataclass
+from pathlib import Path
+import json
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from article_matrix import ArticleMatrix
+from features.tag_matcher import TagMatcher
+from features.category_index import CategoryIndex
+from vector_index import FlatIndex, IVFIndex
+
+SNAPSHOT_FORMAT = 1
+LATEST_POINTER = "LATEST"
+SNAPSHOT_FILES = [
+    "manifest.json",
+    "embeddings.npy",
+    "scales.npy",
+    "ivf.npz",
+    "matrix.parquet",
+    "articles.parquet",
+    "tag_scores.parquet",
+    "traffic.parquet",
+    "site_quartiles.parquet"
+]
+
+
+# Shared by every request without copying, treat all members as read-only
+@dataclass(frozen=True)
+class CacheSnapshot:
+    version: int
+    created_at: float
+    articles: pd.DataFrame
+    tag_scores: pd.DataFrame
+    traffic: pd.DataFrame
+    site_quartiles: pd.DataFrame
+    article_matrix: ArticleMatrix
+    tag_matcher: TagMatcher
+    category_index: CategoryIndex
+    vector_index: object
+    # Latest published or updated time of the cached articles and when they were last fetched in full
+    watermark: pd.Timestamp | None = None
+    full_refresh_at: float = 0.0
+
+
+def write_snapshot(snapshot: CacheSnapshot, directory: Path) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    matrix = snapshot.article_matrix
+
+    np.save(directory / "embeddings.npy", matrix.embeddings)
+    # Always written so every snapshot has the same files, empty unless the matrix is int8
+    np.save(directory / "scales.npy", matrix.scales if matrix.scales is not None else np.empty(0, dtype=np.float32))
+    # IVF clusters so a cold start doesn't have to rerun k-means, empty for the flat index
+    vector_index = snapshot.vector_index
+    ivf = vector_index if isinstance(vector_index, IVFIndex) else None
+    np.savez(
+        directory / "ivf.npz",
+        centroids=ivf.centroids if ivf else np.empty((0, 0), dtype=np.float32),
+        list_offsets=ivf.list_offsets if ivf else np.empty(0, dtype=np.int64),
+        site_list_offsets=ivf.site_list_offsets if ivf else np.empty(0, dtype=np.int64)
+    )
+    pd.DataFrame({
+        "article_id": matrix.article_ids,
+        "pageviews_first_7_days": matrix.pageviews
+    }).to_parquet(directory / "matrix.parquet", index=False)
+    snapshot.articles.to_parquet(directory / "articles.parquet", index=False)
+    snapshot.tag_scores.to_parquet(directory / "tag_scores.parquet", index=False)
+    snapshot.traffic.to_parquet(directory / "traffic.parquet", index=False)
+    snapshot.site_quartiles.to_parquet(directory / "site_quartiles.parquet")
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": snapshot.version,
+        "created_at": snapshot.created_at,
+        "sites": matrix.sites.tolist(),
+        "offsets": matrix.offsets.tolist(),
+        "precision": matrix.precision,
+        "vector_index": vector_index.kind,
+        "ivf_probes": ivf.n_probe if ivf else None,
+        "watermark": snapshot.watermark.isoformat() if snapshot.watermark is not None else None,
+        "full_refresh_at": snapshot.full_refresh_at
+    }
+    (directory / "manifest.json").write_text(json.dumps(manifest))
+
+
+def read_snapshot(directory: Path) -> CacheSnapshot:
+    manifest = json.loads((directory / "manifest.json").read_text())
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format')}")
+
+    # Memory mapped, pages are only read from disk when a request touches them
+    embeddings = np.load(directory / "embeddings.npy", mmap_mode="r")
+    scales = np.load(directory / "scales.npy") if manifest.get("precision") == "int8" else None
+    df_matrix = pd.read_parquet(directory / "matrix.parquet")
+
+    article_matrix = ArticleMatrix(
+        embeddings=embeddings,
+        article_ids=df_matrix["article_id"].to_numpy(),
+        pageviews=df_matrix["pageviews_first_7_days"].to_numpy(dtype=np.float64, na_value=np.nan),
+        sites=np.array(manifest["sites"], dtype=object),
+        offsets=np.array(manifest["offsets"], dtype=np.int64),
+        scales=scales
+    )
+
+    if manifest.get("vector_index") == "ivf":
+        with np.load(directory / "ivf.npz") as ivf:
+            vector_index = IVFIndex(article_matrix, ivf["centroids"], ivf["list_offsets"], ivf["site_list_offsets"],
+                                    n_probe=manifest["ivf_probes"])
+    else:
+        vector_index = FlatIndex(article_matrix)
+
+    articles = pd.read_parquet(directory / "articles.parquet")
+    tag_scores = pd.read_parquet(directory / "tag_scores.parquet")
+
+    return CacheSnapshot(
+        version=manifest["version"],
+        created_at=manifest["created_at"],
+        articles=articles,
+        tag_scores=tag_scores,
+        traffic=pd.read_parquet(directory / "traffic.parquet"),
+        site_quartiles=pd.read_parquet(directory / "site_quartiles.parquet"),
+        article_matrix=article_matrix,
+        tag_matcher=TagMatcher.from_dataframe(tag_scores),
+        category_index=CategoryIndex.from_dataframe(articles),
+        vector_index=vector_index,
+        watermark=pd.Timestamp(manifest["watermark"]) if manifest.get("watermark") else None,
+        full_refresh_at=manifest.get("full_refresh_at", 0.0)
+    )
+
+
+class LocalSnapshotStore:
+    # Each snapshot is written to its own directory, LATEST is switched only once it is complete
+    def __init__(self, path: str):
+        self.root = Path(path)
+
+    def save(self, snapshot: CacheSnapshot) -> None:
+        name = f"{int(snapshot.created_at * 1000)}-{snapshot.version}"
+        previous = self._latest_name()
+
+        write_snapshot(snapshot, self.root / name)
+        pointer = self.root / f".{LATEST_POINTER}.tmp"
+        pointer.write_text(name)
+        pointer.replace(self.root / LATEST_POINTER)
+
+        if previous and previous != name:
+            shutil.rmtree(self.root / previous, ignore_errors=True)
+
+    def load(self) -> CacheSnapshot | None:
+        name = self._latest_name()
+        if name is None:
+            return None
+        return read_snapshot(self.root / name)
+
+    def _latest_name(self) -> str | None:
+        pointer = self.root / LATEST_POINTER
+        return pointer.read_text().strip() if pointer.exists() else None
+
+
+class GCSSnapshotStore:
+    # Files are staged in a local directory so the embedding matrix can still be memory mapped
+    def __init__(self, uri: str, local_dir: str | None = None):
+        from google.cloud import storage
+
+        bucket_name, _, prefix = uri.removeprefix("gs://").partition("/")
+        self.bucket = storage.Client().bucket(bucket_name)
+        self.prefix = prefix.strip("/")
+        self.local_dir = Path(local_dir or tempfile.mkdtemp(prefix="scorer-snapshot-"))
+
+    def save(self, snapshot: CacheSnapshot) -> None:
+        name = f"{int(snapshot.created_at * 1000)}-{snapshot.version}"
+        previous = self._latest_name()
+        staging = Path(tempfile.mkdtemp(prefix="scorer-snapshot-upload-"))
+        try:
+            write_snapshot(snapshot, staging)
+            for file_name in SNAPSHOT_FILES:
+                self.bucket.blob(self._blob_name(name, file_name)).upload_from_filename(str(staging / file_name))
+            self.bucket.blob(self._blob_name(LATEST_POINTER)).upload_from_string(name)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        if previous and previous != name:
+            # Blobs already gone, e.g. removed by another instance, are skipped
+            blobs = list(self.bucket.list_blobs(prefix=self._blob_name(previous) + "/"))
+            self.bucket.delete_blobs(blobs, on_error=lambda blob: None)
+
+    def load(self) -> CacheSnapshot | None:
+        name = self._latest_name()
+        if name is None:
+            return None
+
+        directory = self.local_dir / name
+        directory.mkdir(parents=True, exist_ok=True)
+        for file_name in SNAPSHOT_FILES:
+            self.bucket.blob(self._blob_name(name, file_name)).download_to_filename(str(directory / file_name))
+        return read_snapshot(directory)
+
+    def _latest_name(self) -> str | None:
+        pointer = self.bucket.blob(self._blob_name(LATEST_POINTER))
+        return pointer.download_as_text().strip() if pointer.exists() else None
+
+    def _blob_name(self, *parts: str) -> str:
+        return "/".join(p for p in (self.prefix, *parts) if p)
+
+
+def snapshot_store_from_uri(uri: str | None):
+    if not uri:
+        return None
+    if uri.startswith("gs://"):
+        return GCSSnapshotStore(uri)
+    return LocalSnapshotStore(uri)
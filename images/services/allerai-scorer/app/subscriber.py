@@ -0,0 +1,162 @@
+from concurrent import futures
+from google.cloud import pubsub_v1
+from timing import StageTimer
+import queue
+import signal
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+class StreamingSubscriber:
+    # Streaming pull alternative to the push endpoint: messages are scored in micro-batches through the handler's batch pipeline
+    def __init__(self, handler, subscription_path: str, subscriber=None, max_outstanding_messages: int = 200,
+                 max_batch_size: int = 50, batch_interval_seconds: float = 0.1, publish_timeout_seconds: float = 60):
+        self.handler = handler
+        self.subscription_path = subscription_path
+        self.subscriber = subscriber or pubsub_v1.SubscriberClient()
+        self.flow_control = pubsub_v1.types.FlowControl(max_messages=max_outstanding_messages)
+        self.max_batch_size = max_batch_size
+        self.batch_interval = batch_interval_seconds
+        self.publish_timeout = publish_timeout_seconds
+
+        self._queue = queue.Queue()
+        self._streaming_pull = None
+        self._worker = None
+
+    def run(self, timeout: float | None = None) -> None:
+        # Blocks until stop() is called, the stream fails or timeout passes, then scores what is already pulled
+        self._streaming_pull = self.subscriber.subscribe(
+            self.subscription_path, callback=self._queue.put, flow_control=self.flow_control
+        )
+        self._worker = threading.Thread(target=self._drain_queue, name="subscriber-batches", daemon=True)
+        self._worker.start()
+        logger.info(f"Listening for messages on {self.subscription_path}")
+
+        try:
+            self._streaming_pull.result(timeout=timeout)
+        except (futures.TimeoutError, futures.CancelledError):
+            pass
+        finally:
+            self._streaming_pull.cancel()
+            self._queue.put(None)
+            self._worker.join()
+
+    def stop(self) -> None:
+        if self._streaming_pull is not None:
+            self._streaming_pull.cancel()
+
+    def process_messages(self, messages: list) -> None:
+        decoded = []
+        for message in messages:
+            try:
+                payload = self.handler.request_parser.decode_data(message.data)
+            except (ValueError, TypeError) as e:
+                payload = e
+            decoded.append((payload, dict(message.attributes), message.message_id))
+
+        # Invalid messages, e.g. not a JSON object or an embedding of the wrong dimension, are sent to the error log
+        # by prepare_events and acked, a redelivery would fail the same way and must not hold up the rest of the batch
+        events = self.handler.prepare_events(decoded)
+        # Deliveries are matched by their decoded payload, a message id repeats when Pub/Sub redelivers within a batch
+        by_payload = {id(payload): message for (payload, _, _), message in zip(decoded, messages)}
+        pending = {key: by_payload[id(payload)] for key, (payload, _, _) in events.items()}
+        scored = {id(message) for message in pending.values()}
+        for message in messages:
+            if id(message) not in scored:
+                # Invalid, or a duplicate of an event that is scored in this batch
+                message.ack()
+        if not events:
+            return
+
+        timer = StageTimer()
+        try:
+            results = self.handler.score_batch(events, timer)
+            publish_futures, push_error = self.handler.publish_results(results, timer)
+        except Exception as e:
+            logger.error(f"Error scoring batch of {len(events)} events, nacking: {e}")
+            self.handler.record_timings(timer, "subscriber", "error", events=len(events))
+            for message in pending.values():
+                message.nack()
+            return
+
+        if push_error is not None:
+            # Like the push endpoint: the scores are already published, a redelivery would only publish them again
+            logger.error(f"Error pushing {len(results)} pulled events to the platform: {push_error}")
+            for key in results:
+                self.handler.publish_error(*events[key], push_error)
+
+        # Acked only once the scores are published, so a failed publish is redelivered
+        futures.wait(publish_futures.values(), timeout=self.publish_timeout)
+        failed = 0
+        for key, message in pending.items():
+            future = publish_futures.get(key)
+            if future is None or (future.done() and future.exception() is None):
+                message.ack()
+            else:
+                message.nack()
+                failed += 1
+
+        logger.info(f"Scored {len(events)} pulled events, {failed} nacked ({timer.summary()})")
+        self.handler.record_timings(timer, "subscriber", "success", events=len(events))
+
+    def _drain_queue(self) -> None:
+        stopping = False
+        while not stopping:
+            message = self._queue.get()
+            if message is None:
+                break
+
+            # Collect whatever else arrives within the interval into the same batch
+            batch = [message]
+            deadline = time.monotonic() + self.batch_interval
+            while len(batch) < self.max_batch_size:
+                try:
+                    message = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if message is None:
+                    stopping = True
+                    break
+                batch.append(message)
+
+            try:
+                self.process_messages(batch)
+            except Exception:
+                logger.exception(f"Unexpected error processing {len(batch)} messages, nacking")
+                for message in batch:
+                    message.nack()
+
+
+def main():
+    from event_handler import EventHandler
+    from config import (PROJECT_ID, OUTPUT_TOPIC, OUTPUT_TOPIC_ERROR_LOG, ADP_PROJECT_ID, SNAPSHOT_URI, DOMAIN_SCORING_PATH,
+                        FEATURE_WORKERS, SUBSCRIPTION, SUBSCRIBER_MAX_OUTSTANDING_MESSAGES, SUBSCRIBER_BATCH_SIZE,
+                        SUBSCRIBER_BATCH_INTERVAL_SECONDS, LOG_REQUEST_TIMINGS, ARTICLES_PER_SITE, VECTOR_INDEX, IVF_PROBES,
+                        EMBEDDING_PRECISION, REFRESH_MODE, FULL_REFRESH_INTERVAL_SECONDS, TAG_WORD_BOUNDARIES)
+
+    if not SUBSCRIPTION:
+        raise ValueError("SUBSCRIPTION must be set to run the streaming subscriber")
+
+    handler = EventHandler(PROJECT_ID, OUTPUT_TOPIC, OUTPUT_TOPIC_ERROR_LOG, ADP_PROJECT_ID, SNAPSHOT_URI,
+                           DOMAIN_SCORING_PATH, FEATURE_WORKERS, LOG_REQUEST_TIMINGS, ARTICLES_PER_SITE, VECTOR_INDEX,
+                           IVF_PROBES, EMBEDDING_PRECISION, REFRESH_MODE, FULL_REFRESH_INTERVAL_SECONDS,
+                           TAG_WORD_BOUNDARIES)
+    client = pubsub_v1.SubscriberClient()
+    subscriber = StreamingSubscriber(
+        handler,
+        client.subscription_path(PROJECT_ID, SUBSCRIPTION),
+        client,
+        max_outstanding_messages=SUBSCRIBER_MAX_OUTSTANDING_MESSAGES,
+        max_batch_size=SUBSCRIBER_BATCH_SIZE,
+        batch_interval_seconds=SUBSCRIBER_BATCH_INTERVAL_SECONDS
+    )
+    signal.signal(signal.SIGTERM, lambda *_: subscriber.stop())
+    subscriber.run()
+
+
+if __name__ == "__main__":
+    main()
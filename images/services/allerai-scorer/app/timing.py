@@ -0,0 +1,28 @@
+from contextlib import contextmanager
+import time
+
+
+class StageTimer:
+    # Wall-clock durations of the named stages of one request, in seconds
+    def __init__(self):
+        self.durations = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = time.perf_counter() - start
+
+    def timed(self, name: str, fn, *args, **kwargs):
+        with self.stage(name):
+            return fn(*args, **kwargs)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def summary(self) -> str:
+        stages = " ".join(f"{name}={duration * 1000:.1f}ms" for name, duration in self.durations.items())
+        return f"{stages} total={self.elapsed() * 1000:.1f}ms"
@@ -0,0 +1,147 @@
+import numpy as np
+from article_matrix import ArticleMatrix, top_k_columns
+
+VECTOR_INDEXES = ("flat", "ivf")
+
+
+class FlatIndex:
+    # Exact search: every event is scored against every cached article
+    kind = "flat"
+
+    def __init__(self, article_matrix: ArticleMatrix):
+        self.article_matrix = article_matrix
+
+    def prepare(self, context) -> None:
+        context.similarities
+
+    def site_top_k(self, context, k: int, valid: np.ndarray | None = None):
+        return self.article_matrix.site_top_k(context.similarities, k, valid)
+
+
+class IVFIndex:
+    # Inverted file index: the articles of each site are clustered at refresh and rows are reordered so every
+    # cluster is a contiguous slice of the matrix; a search only scores the n_probe closest clusters per site
+    kind = "ivf"
+
+    def __init__(self, article_matrix: ArticleMatrix, centroids: np.ndarray, list_offsets: np.ndarray,
+                 site_list_offsets: np.ndarray, n_probe: int = 8):
+        # Rows of article_matrix are already grouped by cluster, see train()
+        self.article_matrix = article_matrix
+        self.centroids = centroids
+        self.n_probe = n_probe
+        # Clusters of sites[i] are [site_list_offsets[i], site_list_offsets[i + 1]), rows of cluster j are [list_offsets[j], list_offsets[j + 1])
+        self.list_offsets = list_offsets
+        self.site_list_offsets = site_list_offsets
+
+        # Clusters padded to a (sites x most clusters) grid like ArticleMatrix.site_rows, empty clusters are never probed
+        list_counts = np.diff(list_offsets)
+        counts = np.diff(site_list_offsets)
+        columns = np.arange(counts.max() if len(counts) else 0)
+        self.site_lists_mask = columns < counts[:, None]
+        self.site_lists = np.where(self.site_lists_mask, site_list_offsets[:-1, None] + columns, 0)
+        if len(list_counts):
+            self.site_lists_mask &= list_counts[self.site_lists] > 0
+
+    @classmethod
+    def train(cls, article_matrix: ArticleMatrix, n_probe: int = 8, lists_per_site: int | None = None,
+              train_iterations: int = 10, seed: int = 0) -> "IVFIndex":
+        rng = np.random.default_rng(seed)
+
+        orders, centroids, list_counts, site_lists = [], [], [], []
+        for _, rows in article_matrix.site_slices():
+            vectors = article_matrix.vectors(rows.start, rows.stop)
+            n_lists = min(lists_per_site or max(1, int(np.sqrt(len(vectors)))), len(vectors))
+            site_centroids = cls._train(vectors, n_lists, train_iterations, rng)
+            assignment = cls._assign(vectors, site_centroids)
+
+            orders.append(rows.start + np.argsort(assignment, kind="stable"))
+            centroids.append(site_centroids)
+            list_counts.append(np.bincount(assignment, minlength=n_lists))
+            site_lists.append(n_lists)
+
+        dim = article_matrix.embeddings.shape[1]
+        list_counts = np.concatenate(list_counts) if list_counts else np.empty(0, dtype=np.int64)
+        return cls(
+            article_matrix=article_matrix.permuted(np.concatenate(orders)) if orders else article_matrix,
+            centroids=np.vstack(centroids) if centroids else np.empty((0, dim), dtype=np.float32),
+            list_offsets=np.concatenate([[0], np.cumsum(list_counts)]).astype(np.int64),
+            site_list_offsets=np.concatenate([[0], np.cumsum(site_lists)]).astype(np.int64),
+            n_probe=n_probe
+        )
+
+    @staticmethod
+    def _train(vectors: np.ndarray, n_lists: int, iterations: int, rng) -> np.ndarray:
+        # Spherical k-means on a sample, the centroids are unit vectors like the articles
+        sample = vectors[rng.choice(len(vectors), min(len(vectors), 64 * n_lists), replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = IVFIndex._assign(sample, centroids)
+            order = np.argsort(assignment, kind="stable")
+            lists, starts = np.unique(assignment[order], return_index=True)
+            centroids[lists] = np.add.reduceat(sample[order], starts, axis=0)
+            centroids = ArticleMatrix.normalize(centroids)
+        return centroids
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+            for start in range(0, len(vectors), chunk)
+        ]) if len(vectors) else np.empty(0, dtype=np.int64)
+
+    def prepare(self, context):
+        # Normalized queries and the probed clusters of every site, (events, sites, n_probe) plus a validity mask
+        return context.get("ivf_probes", lambda: self._probe(ArticleMatrix.normalize(context.queries)))
+
+    def _probe(self, queries: np.ndarray):
+        padded = np.where(self.site_lists_mask, (queries @ self.centroids.T)[:, self.site_lists], -np.inf)
+        top = top_k_columns(padded, self.n_probe)
+        lists = np.take_along_axis(np.broadcast_to(self.site_lists, padded.shape), top, axis=-1)
+        mask = np.take_along_axis(np.broadcast_to(self.site_lists_mask, padded.shape), top, axis=-1)
+        return queries, lists, mask
+
+    def site_top_k(self, context, k: int, valid: np.ndarray | None = None):
+        # Same contract as ArticleMatrix.site_top_k, exact within the probed clusters
+        queries, lists, mask = self.prepare(context)
+        n_sites = len(self.article_matrix.sites)
+        rows = np.zeros((len(queries), n_sites, k), dtype=np.int64)
+        scores = np.full((len(queries), n_sites, k), -np.inf, dtype=np.float32)
+        top_mask = np.zeros((len(queries), n_sites, k), dtype=bool)
+
+        article_matrix = self.article_matrix
+        for e, query in enumerate(queries):
+            probed = lists[e][mask[e]]
+            starts, ends = self.list_offsets[probed], self.list_offsets[probed + 1]
+            if not len(probed):
+                continue
+            candidate_rows = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+            candidate_scores = np.concatenate([article_matrix.vectors(start, end) @ query for start, end in zip(starts, ends)])
+
+            # Candidates are grouped by site, in site order, because the probe grid is
+            candidate_sites = np.repeat(np.repeat(np.arange(n_sites), mask[e].sum(axis=-1)), ends - starts)
+            if valid is not None:
+                keep = valid[candidate_rows]
+                candidate_rows, candidate_scores, candidate_sites = candidate_rows[keep], candidate_scores[keep], candidate_sites[keep]
+
+            counts = np.bincount(candidate_sites, minlength=n_sites)
+            offsets = np.concatenate([[0], np.cumsum(counts)])
+            columns = np.arange(counts.max() if len(counts) else 0)
+            grid_mask = columns < counts[:, None]
+            grid = np.where(grid_mask, offsets[:-1, None] + columns, 0)
+            padded = np.where(grid_mask, candidate_scores[grid], -np.inf)
+
+            top = top_k_columns(padded, k)
+            width = top.shape[-1]
+            rows[e, :, :width] = candidate_rows[np.take_along_axis(grid, top, axis=-1)]
+            scores[e, :, :width] = np.take_along_axis(padded, top, axis=-1)
+            top_mask[e, :, :width] = np.take_along_axis(grid_mask, top, axis=-1)
+
+        return rows, scores, top_mask
+
+
+def build_vector_index(kind: str, article_matrix: ArticleMatrix, n_probe: int = 8):
+    if kind == "flat":
+        return FlatIndex(article_matrix)
+    if kind == "ivf":
+        return IVFIndex.train(article_matrix, n_probe=n_probe)
+    raise ValueError(f"Unknown vector index '{kind}', expected one of {VECTOR_INDEXES}")
@@ -0,0 +1,50 @@
+import argparse
+import sys
+from pathlib import Path
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "app"))
+from article_matrix import ArticleMatrix, PRECISIONS
+from vector_index import FlatIndex
+from synthetic import make_articles
+from vector_index_benchmark import make_events, search, recall, mean_top_error
+
+
+def similarity_error(exact: ArticleMatrix, quantized: ArticleMatrix, events: list) -> float:
+    queries = np.stack([event.embedding for event in events])
+    return float(np.abs(exact.similarities(queries) - quantized.similarities(queries)).max())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory and top-N agreement of the quantized article matrix against float32.")
+    parser.add_argument("--sites", type=int, default=20)
+    parser.add_argument("--articles_per_site", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--clusters", type=int, default=500, help="Topic clusters in the synthetic embeddings, 0 for noise")
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument("--top_n", type=int, default=10)
+    args = parser.parse_args()
+
+    df_articles = make_articles(args.sites, args.articles_per_site, args.dim, clusters=args.clusters)
+    df_articles["pageviews_first_7_days"] = np.where(np.random.default_rng(2).random(len(df_articles)) < 0.7, 1000, np.nan)
+    matrices = {precision: ArticleMatrix.from_dataframes(df_articles, precision) for precision in PRECISIONS}
+    del df_articles
+
+    reference = matrices["float32"]
+    events = make_events(reference, args.events)
+    has_traffic = ~np.isnan(reference.pageviews)
+    exact, _ = search(FlatIndex(reference), events, args.top_n, None)
+    exact_traffic, _ = search(FlatIndex(reference), events, 25, has_traffic)
+
+    print(f"{args.sites} sites x {args.articles_per_site} articles x {args.dim} dims, {args.events} events")
+    print(f"{'precision':<12}{'MB':>10}{'saved':>10}{'p50 ms':>10}{'overlap':>10}{'traffic':>10}"
+          f"{'mean err':>10}{'max err':>10}{'sim err':>10}")
+
+    for precision, matrix in matrices.items():
+        approximate, latencies = search(FlatIndex(matrix), events, args.top_n, None)
+        approximate_traffic, _ = search(FlatIndex(matrix), events, 25, has_traffic)
+        mean_error, max_error = mean_top_error(exact, approximate)
+        print(f"{precision:<12}{matrix.nbytes / 2 ** 20:>10.1f}{1 - matrix.nbytes / reference.nbytes:>10.0%}"
+              f"{np.percentile(latencies, 50):>10.2f}{recall(exact, approximate):>10.3f}"
+              f"{recall(exact_traffic, approximate_traffic):>10.3f}{mean_error:>10.4f}{max_error:>10.4f}"
+              f"{similarity_error(reference, matrix, events):>10.4f}")
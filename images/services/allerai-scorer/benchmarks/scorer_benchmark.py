@@ -0,0 +1,169 @@
+import argparse
+import json
+import logging
+import resource
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import orjson
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "app"))
+from stubs import install_gcp_stubs, stub_data_manager, StubPlatformClient
+from synthetic import make_articles, make_traffic, make_tag_scores, make_event_payloads, push_envelope
+
+install_gcp_stubs()
+from flask import Flask
+import data_access
+import event_handler
+import platform_push
+from features.context import FeatureContext
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+SIZE_ARGS = ["sites", "articles_per_site", "dim", "tags_per_site", "body_words"]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(fn, inputs: list, warmup: int) -> dict:
+    for i in range(min(warmup, len(inputs))):
+        fn(inputs[i])
+
+    latencies = []
+    start = time.perf_counter()
+    for item in inputs:
+        t0 = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "runs": len(inputs),
+        "throughput_per_s": round(len(inputs) / total, 2),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+
+
+def run(args) -> dict:
+    articles = make_articles(args.sites, args.articles_per_site, args.dim)
+    stub_data_manager(
+        data_access.DataManager,
+        articles,
+        make_tag_scores(args.sites, args.tags_per_site),
+        make_traffic(articles)
+    )
+    platform_push._client = StubPlatformClient()
+
+    handler = event_handler.EventHandler("benchmark-project", "scores", "errors", "benchmark-adp",
+                                         feature_workers=args.feature_workers)
+    payloads = make_event_payloads(args.requests, args.dim, args.body_words, args.sites, args.tags_per_site)
+    bodies = [orjson.dumps(push_envelope(payload, str(i))) for i, payload in enumerate(payloads)]
+    flask_app = Flask("benchmark")
+
+    results = {}
+
+    start = time.perf_counter()
+    handler.data_manager.refresh_cache()
+    results["cache_refresh"] = {"runs": 1, "p50_ms": round((time.perf_counter() - start) * 1000, 3),
+                                "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+    def process_request(body):
+        with flask_app.test_request_context("/", method="POST", data=body, content_type="application/json"):
+            from flask import request
+            _, status = handler.process_request(request)
+            if status != 200:
+                raise RuntimeError(f"process_request returned {status}")
+
+    results["process_request"] = measure(process_request, bodies, args.warmup)
+
+    # Each feature on its own, against a context whose similarity matrix is already computed
+    snapshot = handler.data_manager.get_snapshot()
+    events = handler.request_parser.payloads_to_events(payloads)
+
+    def context_for(event):
+        return FeatureContext([event], snapshot)
+
+    results["similarity_matrix"] = measure(lambda event: context_for(event).similarities, events, args.warmup)
+
+    contexts = [context_for(event) for event in events]
+    for context in contexts:
+        context.similarities
+
+    features = {
+        "potential": lambda context: handler.potential_scorer.predict_classification(context),
+        "similarity": lambda context: handler.similarity_scorer.embedding_relevance(context),
+        "classification": lambda context: handler.classification_scorer.category_relevance(context),
+        "tags": lambda context: handler.tag_scorer.tag_relevance(context)
+    }
+    for name, fn in features.items():
+        results[name] = measure(fn, contexts, args.warmup)
+
+    combined = [
+        features["similarity"](context)
+        .merge(features["classification"](context), on=["id", "site_domain"], how="inner")
+        .merge(features["tags"](context), on=["id", "site_domain"], how="left")
+        .fillna({"tag_score": 0})
+        for context in contexts
+    ]
+    results["weighted_score"] = measure(handler.scorer.compute_weighted_score, combined, args.warmup)
+
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    print(f"\n{'benchmark':<20}{'p50 ms':>10}{'baseline':>10}{'ratio':>8}")
+    for name, result in results.items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            continue
+        ratio = result["p50_ms"] / reference["p50_ms"] if reference["p50_ms"] else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<20}{result['p50_ms']:>10.2f}{reference['p50_ms']:>10.2f}{ratio:>8.2f}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end and per-feature latency of the scorer on synthetic data.")
+    parser.add_argument("--sites", type=int, default=20)
+    parser.add_argument("--articles_per_site", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--tags_per_site", type=int, default=1000)
+    parser.add_argument("--body_words", type=int, default=800)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--feature_workers", type=int, default=4)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save_baseline", action="store_true", help="Write the results to --baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p50 slowdown against the baseline")
+    parser.add_argument("--fail_on_regression", action="store_true")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    results = run(args)
+    sizes = {name: getattr(args, name) for name in SIZE_ARGS}
+
+    print(", ".join(f"{name}={value}" for name, value in sizes.items()) + f", requests={args.requests}")
+    print(f"{'benchmark':<20}{'per s':>10}{'p50 ms':>10}{'p99 ms':>10}{'rss MB':>10}")
+    for name, result in results.items():
+        print(f"{name:<20}{result.get('throughput_per_s', 0):>10.1f}{result['p50_ms']:>10.2f}"
+              f"{result.get('p99_ms', result['p50_ms']):>10.2f}{result['peak_rss_mb']:>10.1f}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({"sizes": sizes, "results": results}, indent=2) + "\n")
+        print(f"\nSaved baseline to {args.baseline}")
+    elif args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["sizes"] != sizes:
+            print(f"\nBaseline was recorded with {baseline['sizes']}, not comparing")
+        elif compare(results, baseline, args.tolerance) and args.fail_on_regression:
+            sys.exit(1)
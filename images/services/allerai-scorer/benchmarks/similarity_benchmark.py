@@ -0,0 +1,76 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "app"))
+from article_matrix import ArticleMatrix
+from features.context import FeatureContext
+from features.similarity import SimilarityScorer
+from parsers import Event
+from vector_index import FlatIndex
+
+
+def make_articles(sites, articles_per_site, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "article_id": [f"{s}-{a}" for s in range(sites) for a in range(articles_per_site)],
+        "site_domain": [f"site{s}.no" for s in range(sites) for _ in range(articles_per_site)],
+        "embeddings_en": list(rng.normal(size=(sites * articles_per_site, dim)).astype(np.float32))
+    })
+
+
+# Per-site loop as the scorer did it before the article matrix existed
+def legacy_embedding_relevance(event_embedding, df_articles, top_n):
+    results = []
+    for site, candidates in df_articles.groupby("site_domain"):
+        candidate_embeddings = np.vstack([np.array(e, dtype=np.float32) for e in candidates["embeddings_en"]])
+        candidate_embeddings /= np.linalg.norm(candidate_embeddings, axis=1, keepdims=True)
+        sims = candidate_embeddings @ (event_embedding / np.linalg.norm(event_embedding))
+        df_sims = pd.DataFrame({"article_id": candidates["article_id"].tolist(), "embedding_similarity": sims})
+        results.append({
+            "site_domain": site,
+            "embedding_similarity": df_sims.nlargest(top_n, "embedding_similarity")["embedding_similarity"].mean()
+        })
+    return pd.DataFrame(results)
+
+
+def time_per_event(fn, events):
+    start = time.perf_counter()
+    for event in events:
+        fn(event)
+    return (time.perf_counter() - start) / len(events) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-event latency of SimilarityScorer.embedding_relevance.")
+    parser.add_argument("--sites", type=int, default=20)
+    parser.add_argument("--articles_per_site", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--top_n", type=int, default=10)
+    args = parser.parse_args()
+
+    df_articles = make_articles(args.sites, args.articles_per_site, args.dim)
+    article_matrix = ArticleMatrix.from_dataframes(df_articles)
+    events = np.random.default_rng(1).normal(size=(args.events, args.dim)).astype(np.float32)
+    scorer = SimilarityScorer()
+
+    def vectorized(embedding):
+        snapshot = SimpleNamespace(article_matrix=article_matrix, vector_index=FlatIndex(article_matrix))
+        context = FeatureContext([Event("event", "", embedding)], snapshot)
+        return scorer.embedding_relevance(context, top_n=args.top_n)
+
+    expected = legacy_embedding_relevance(events[0], df_articles, args.top_n)
+    actual = vectorized(events[0])
+    np.testing.assert_allclose(actual["embedding_similarity"], expected["embedding_similarity"], rtol=1e-5, atol=1e-6)
+
+    legacy_ms = time_per_event(lambda e: legacy_embedding_relevance(e, df_articles, args.top_n), events)
+    vectorized_ms = time_per_event(vectorized, events)
+
+    print(f"{args.sites} sites x {args.articles_per_site} articles x {args.dim} dims, {args.events} events")
+    print(f"legacy per-site loop: {legacy_ms:8.2f} ms/event")
+    print(f"vectorized matrix:    {vectorized_ms:8.2f} ms/event ({legacy_ms / vectorized_ms:.1f}x)")
@@ -0,0 +1,87 @@
+import sys
+import types
+from concurrent import futures
+
+
+class _Settings:
+    def __init__(self, *args, **kwargs):
+        self.kwargs = kwargs
+
+
+class StubPublisher:
+    # Completes every publish immediately, keeping only a count of the messages and bytes
+    def __init__(self, *args, **kwargs):
+        self.messages = 0
+        self.bytes = 0
+
+    def topic_path(self, project_id, topic):
+        return f"projects/{project_id}/topics/{topic}"
+
+    def publish(self, topic, data, **attributes):
+        self.messages += 1
+        self.bytes += len(data)
+        future = futures.Future()
+        future.set_result(str(self.messages))
+        return future
+
+
+class StubPlatformClient:
+    def __init__(self):
+        self.rows = 0
+
+    def push(self, rows):
+        self.rows += len(rows)
+
+
+def install_gcp_stubs() -> None:
+    # The benchmarks run offline: google.auth, BigQuery and Pub/Sub are replaced before the app is imported
+    google = types.ModuleType("google")
+    google.__path__ = []
+    auth = types.ModuleType("google.auth")
+    auth.default = lambda: (None, "benchmark-project")
+    cloud = types.ModuleType("google.cloud")
+    cloud.__path__ = []
+
+    bigquery = types.ModuleType("google.cloud.bigquery")
+    bigquery.Client = _Settings
+    bigquery.ScalarQueryParameter = _Settings
+    bigquery.ArrayQueryParameter = _Settings
+    bigquery.QueryJobConfig = _Settings
+
+    api_core = types.ModuleType("google.api_core")
+    api_core.__path__ = []
+    exceptions = types.ModuleType("google.api_core.exceptions")
+    exceptions.NotFound = type("NotFound", (Exception,), {})
+    api_core.exceptions = exceptions
+
+    pubsub_v1 = types.ModuleType("google.cloud.pubsub_v1")
+    pubsub_v1.PublisherClient = StubPublisher
+    pubsub_v1.types = types.SimpleNamespace(
+        BatchSettings=_Settings,
+        PublisherOptions=_Settings,
+        PublishFlowControl=_Settings,
+        FlowControl=_Settings,
+        LimitExceededBehavior=types.SimpleNamespace(BLOCK="block")
+    )
+
+    google.auth = auth
+    google.cloud = cloud
+    google.api_core = api_core
+    cloud.bigquery = bigquery
+    cloud.pubsub_v1 = pubsub_v1
+    sys.modules.update({
+        "google": google,
+        "google.auth": auth,
+        "google.cloud": cloud,
+        "google.api_core": api_core,
+        "google.api_core.exceptions": exceptions,
+        "google.cloud.bigquery": bigquery,
+        "google.cloud.pubsub_v1": pubsub_v1
+    })
+
+
+def stub_data_manager(data_manager_cls, articles, tag_scores, traffic) -> None:
+    # BigQuery fetches return copies of the synthetic frames, the rest of the refresh runs as in production
+    data_manager_cls._fetch_articles = lambda self, *args, **kwargs: self.validate_embeddings_column(articles.copy())
+    data_manager_cls._fetch_tag_scores = lambda self, *args, **kwargs: tag_scores.copy()
+    data_manager_cls._fetch_traffic_data = lambda self, *args, **kwargs: traffic.copy()
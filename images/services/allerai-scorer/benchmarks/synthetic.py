@@ -0,0 +1,94 @@
+import base64
+import numpy as np
+import orjson
+import pandas as pd
+
+CATEGORIES = ["News", "Sport", "Entertainment", "Celebrities", "Lifestyle", "Motor", "Travel", "Food", "Other"]
+WORDS = ["the", "and", "of", "to", "in", "a", "is", "was", "for", "on", "with", "said", "after", "new", "year"]
+
+
+def site_domains(sites: int) -> list:
+    # dagbladet.no is always included so events from it resolve to a supported site
+    return ["dagbladet.no"] + [f"site{i}.no" for i in range(1, sites)]
+
+
+def make_embeddings(n: int, dim: int, clusters: int, rng) -> np.ndarray:
+    # Isotropic noise, or points around `clusters` topic centers which is closer to real text embeddings
+    if clusters <= 0:
+        return rng.normal(size=(n, dim)).astype(np.float32)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(0, clusters, n)] + rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def make_articles(sites: int, articles_per_site: int, dim: int, seed: int = 0, clusters: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    n = sites * articles_per_site
+    domains = np.repeat(site_domains(sites), articles_per_site)
+    published = pd.Timestamp("2025-01-01", tz="UTC") + pd.to_timedelta(np.arange(n) % articles_per_site, unit="h")
+    return pd.DataFrame({
+        "article_id": [f"{domain}-{i % articles_per_site}" for i, domain in enumerate(domains)],
+        "site_domain": domains,
+        "main_category": rng.choice(CATEGORIES, n),
+        "category": [f"{c}{i}" for c, i in zip(rng.choice(CATEGORIES, n), rng.integers(0, 10, n))],
+        "sub_category": [f"{c}{i}" for c, i in zip(rng.choice(CATEGORIES, n), rng.integers(0, 50, n))],
+        "embeddings_en": list(make_embeddings(n, dim, clusters, rng)),
+        "published_ts": published,
+        "updated_ts": published
+    })
+
+
+def make_traffic(df_articles: pd.DataFrame, coverage: float = 0.7, seed: int = 0) -> pd.DataFrame:
+    # Pageviews for a share of the articles, the rest have no traffic yet
+    rng = np.random.default_rng(seed)
+    traffic = df_articles[["article_id", "site_domain"]].sample(frac=coverage, random_state=seed).reset_index(drop=True)
+    traffic["pageviews_first_7_days"] = pd.array(rng.lognormal(8, 1.5, len(traffic)).astype(np.int64), dtype="Int64")
+    return traffic
+
+
+def make_tags(sites: int, tags_per_site: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    vocabulary = [f"person{i} name{i}" for i in range(tags_per_site * 2)]
+    return [rng.choice(vocabulary, tags_per_site, replace=False).tolist() for _ in range(sites)]
+
+
+def make_tag_scores(sites: int, tags_per_site: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    rows = []
+    for domain, tags in zip(site_domains(sites), make_tags(sites, tags_per_site, seed)):
+        max_frequency = int(rng.integers(50, 500))
+        for tag in tags:
+            rows.append({
+                "site": domain,
+                "tag": tag.title(),
+                "frequency": int(rng.integers(1, max_frequency)),
+                "total_articles": 1000,
+                "max_frequency": max_frequency,
+                "tag_type": "PERSON"
+            })
+    return pd.DataFrame(rows)
+
+
+def make_event_payloads(events: int, dim: int, body_words: int, sites: int, tags_per_site: int, seed: int = 1) -> list:
+    # Bodies are filler words with a few known tags mixed in, so tag matching finds something
+    rng = np.random.default_rng(seed)
+    tags = [tag for site_tags in make_tags(sites, tags_per_site) for tag in site_tags]
+    payloads = []
+    for i in range(events):
+        words = rng.choice(WORDS, body_words).tolist()
+        for position in rng.integers(0, body_words, 5):
+            words[position] = str(rng.choice(tags)).title()
+        payloads.append({
+            "article_id": f"event-{i}",
+            "site_domain": "www.dagbladet.no",
+            "embeddings_en": rng.normal(size=dim).tolist(),
+            "main_category": str(rng.choice(CATEGORIES)),
+            "category": f"{rng.choice(CATEGORIES)}{rng.integers(0, 10)}",
+            "sub_category": f"{rng.choice(CATEGORIES)}{rng.integers(0, 50)}",
+            "bodytext_en": " ".join(words)
+        })
+    return payloads
+
+
+def push_envelope(payload: dict, message_id: str = "1") -> dict:
+    data = base64.b64encode(orjson.dumps({"merged_payload": payload})).decode()
+    return {"message": {"messageId": message_id, "attributes": {"event_source": "benchmark"}, "data": data}}
@@ -0,0 +1,96 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "app"))
+from article_matrix import ArticleMatrix
+from features.context import FeatureContext
+from parsers import Event
+from vector_index import FlatIndex, IVFIndex
+from synthetic import make_articles
+
+
+def make_events(article_matrix: ArticleMatrix, events: int, seed: int = 1) -> list:
+    # New articles about existing topics: cached articles plus as much noise again
+    rng = np.random.default_rng(seed)
+    base = article_matrix.embeddings[rng.integers(0, len(article_matrix.article_ids), events)]
+    queries = base + rng.normal(scale=1 / np.sqrt(base.shape[1]), size=base.shape).astype(np.float32)
+    return [Event(f"event-{i}", "", query) for i, query in enumerate(queries)]
+
+
+def search(vector_index, events: list, k: int, valid: np.ndarray | None) -> tuple:
+    results, latencies = [], []
+    snapshot = SimpleNamespace(article_matrix=vector_index.article_matrix, vector_index=vector_index)
+    for event in events:
+        start = time.perf_counter()
+        context = FeatureContext([event], snapshot)
+        rows, scores, mask = context.site_top_k(k, valid)
+        latencies.append(time.perf_counter() - start)
+        results.append((vector_index.article_matrix.article_ids[rows[0]], scores[0], mask[0]))
+    return results, np.array(latencies) * 1000
+
+
+def recall(exact: list, approximate: list) -> float:
+    # Share of the exact per-site top k article ids that the approximate search also returned
+    found = total = 0
+    for (exact_ids, _, exact_mask), (ids, _, mask) in zip(exact, approximate):
+        for site in range(len(exact_ids)):
+            expected = set(exact_ids[site][exact_mask[site]])
+            found += len(expected & set(ids[site][mask[site]]))
+            total += len(expected)
+    return found / total if total else 1.0
+
+
+def mean_top_error(exact: list, approximate: list) -> tuple:
+    # Mean and largest difference of the per-site mean top-k similarity, the value SimilarityScorer reports
+    def site_means(result):
+        _, scores, mask = result
+        return np.where(mask, scores, 0).sum(axis=-1) / np.maximum(mask.sum(axis=-1), 1)
+    errors = np.concatenate([np.abs(site_means(e) - site_means(a)) for e, a in zip(exact, approximate)])
+    return errors.mean(), errors.max()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall and latency of the IVF vector index against exact search.")
+    parser.add_argument("--sites", type=int, default=4)
+    parser.add_argument("--articles_per_site", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--clusters", type=int, default=500, help="Topic clusters in the synthetic embeddings, 0 for noise")
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--top_n", type=int, default=10)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    df_articles = make_articles(args.sites, args.articles_per_site, args.dim, clusters=args.clusters)
+    df_articles["pageviews_first_7_days"] = np.where(np.random.default_rng(2).random(len(df_articles)) < 0.7, 1000, np.nan)
+    article_matrix = ArticleMatrix.from_dataframes(df_articles)
+    del df_articles
+
+    start = time.perf_counter()
+    ivf = IVFIndex.train(article_matrix)
+    build_s = time.perf_counter() - start
+    # Same row order for both indexes so their rows are comparable
+    flat = FlatIndex(ivf.article_matrix)
+    events = make_events(ivf.article_matrix, args.events)
+    has_traffic = ~np.isnan(ivf.article_matrix.pageviews)
+
+    print(f"{args.sites} sites x {args.articles_per_site} articles x {args.dim} dims, {args.events} events, "
+          f"{len(ivf.centroids)} clusters built in {build_s:.1f}s")
+    print(f"{'index':<12}{'p50 ms':>10}{'p99 ms':>10}{'recall':>10}{'traffic':>10}{'mean err':>10}{'max err':>10}")
+
+    exact, latencies = search(flat, events, args.top_n, None)
+    exact_traffic, _ = search(flat, events, 25, has_traffic)
+    print(f"{'flat':<12}{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 99):>10.2f}"
+          f"{1:>10.3f}{1:>10.3f}{0:>10.4f}{0:>10.4f}")
+
+    for n_probe in args.probes:
+        ivf.n_probe = n_probe
+        approximate, latencies = search(ivf, events, args.top_n, None)
+        approximate_traffic, _ = search(ivf, events, 25, has_traffic)
+        mean_error, max_error = mean_top_error(exact, approximate)
+        print(f"{f'ivf/{n_probe}':<12}{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 99):>10.2f}"
+              f"{recall(exact, approximate):>10.3f}{recall(exact_traffic, approximate_traffic):>10.3f}"
+              f"{mean_error:>10.4f}{max_error:>10.4f}")
@@ -0,0 +1,85 @@
+import sys
+from concurrent import futures
+from pathlib import Path
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import google.auth
+from google.cloud import bigquery, pubsub_v1
+import data_access
+import platform_push
+from synthetic import make_articles, make_traffic, make_tag_scores, make_event_payloads
+
+SITES, ARTICLES_PER_SITE, DIM, TAGS_PER_SITE = 3, 200, 32, 50
+
+
+class FakePublisher:
+    # In-memory stand-in for pubsub_v1.PublisherClient; publishes to a topic in fail_topics return a failed future
+    instances = []
+
+    def __init__(self, batch_settings=None, publisher_options=None):
+        self.batch_settings = batch_settings
+        self.publisher_options = publisher_options
+        self.messages = []
+        self.fail_topics = set()
+        FakePublisher.instances.append(self)
+
+    def topic_path(self, project_id, topic):
+        return f"projects/{project_id}/topics/{topic}"
+
+    def publish(self, topic, data, **attributes):
+        self.messages.append((topic, data, attributes))
+        future = futures.Future()
+        if topic in self.fail_topics:
+            future.set_exception(RuntimeError(f"publish to {topic} failed"))
+        else:
+            future.set_result(str(len(self.messages)))
+        return future
+
+
+class FakePlatformClient:
+    def __init__(self):
+        self.rows = []
+
+    def push(self, rows):
+        self.rows.extend(rows)
+
+
+@pytest.fixture(autouse=True)
+def fake_gcp(monkeypatch):
+    # No credentials, BigQuery or Pub/Sub are touched by the tests
+    FakePublisher.instances = []
+    monkeypatch.setattr(google.auth, "default", lambda *args, **kwargs: (None, "test-project"))
+    monkeypatch.setattr(bigquery, "Client", lambda *args, **kwargs: None)
+    monkeypatch.setattr(pubsub_v1, "PublisherClient", FakePublisher)
+    monkeypatch.setattr(platform_push, "_client", FakePlatformClient())
+
+
+@pytest.fixture
+def reference_data(monkeypatch):
+    # DataManager reads synthetic articles, tag scores and traffic instead of querying BigQuery
+    articles = make_articles(SITES, ARTICLES_PER_SITE, DIM, clusters=20)
+    tag_scores = make_tag_scores(SITES, TAGS_PER_SITE)
+    traffic = make_traffic(articles)
+    monkeypatch.setattr(data_access.DataManager, "_fetch_articles",
+                        lambda self, since=None: self.validate_embeddings_column(articles.copy()))
+    monkeypatch.setattr(data_access.DataManager, "_fetch_tag_scores", lambda self: tag_scores.copy())
+    monkeypatch.setattr(data_access.DataManager, "_fetch_traffic_data", lambda self, since=None: traffic.copy())
+    return articles, tag_scores, traffic
+
+
+@pytest.fixture
+def payloads():
+    return make_event_payloads(5, DIM, 100, SITES, TAGS_PER_SITE)
+
+
+@pytest.fixture
+def make_handler(reference_data):
+    import event_handler
+
+    def make(**kwargs):
+        return event_handler.EventHandler("test-project", "scores", "errors", "adp", feature_workers=1, **kwargs)
+    return make
@@ -0,0 +1,72 @@
+import base64
+import orjson
+from flask import Flask
+from conftest import FakePublisher
+import platform_push
+from platform_push import PlatformUnavailableError
+
+
+def message(payload, message_id: str) -> dict:
+    return {"messageId": message_id, "attributes": {}, "data": base64.b64encode(orjson.dumps(payload)).decode()}
+
+
+def post_batch(handler, messages: list):
+    with Flask("test").test_request_context("/batch", method="POST", json={"messages": messages}):
+        from flask import request
+        response, status = handler.process_batch(request)
+        return response.get_json(), status
+
+
+def error_logs() -> list:
+    return [orjson.loads(data) for publisher in FakePublisher.instances
+            for topic, data, _ in publisher.messages if topic.endswith("/errors")]
+
+
+def test_bad_events_do_not_fail_the_batch(make_handler, payloads):
+    handler = make_handler()
+    wrong_dimension = dict(payloads[3], article_id="wrong-dimension", embeddings_en=payloads[3]["embeddings_en"][:-1])
+    messages = [message({"merged_payload": payload}, str(i)) for i, payload in enumerate(payloads[:3])] + [
+        message({"merged_payload": wrong_dimension}, "wrong-dimension"),
+        message([1], "not-an-object"),
+        "not-a-message"
+    ]
+
+    body, status = post_batch(handler, messages)
+
+    assert status == 200
+    assert body == {"status": "success", "scored": 3, "failed": 3}
+    errors = {error["message_id"]: error["error"] for error in error_logs()}
+    assert set(errors) == {"wrong-dimension", "not-an-object", None}
+    assert "dimensions" in errors["wrong-dimension"]
+    assert "JSON object" in errors["not-an-object"]
+
+
+def test_batch_of_only_bad_events(make_handler):
+    body, status = post_batch(make_handler(), [message([1], "a"), message({"merged_payload": {}}, "b")])
+
+    assert status == 200
+    assert body == {"status": "success", "scored": 0, "failed": 2}
+    assert len(error_logs()) == 2
+
+
+def test_duplicate_article_ids_are_logged(make_handler, payloads):
+    messages = [message({"merged_payload": payloads[0]}, "first"), message({"merged_payload": payloads[0]}, "second")]
+
+    body, status = post_batch(make_handler(), messages)
+
+    assert (body, status) == ({"status": "success", "scored": 1, "failed": 1}, 200)
+    assert [error["message_id"] for error in error_logs()] == ["first"]
+
+
+def test_platform_failure_is_logged_per_event(make_handler, payloads, monkeypatch):
+    class UnavailablePlatform:
+        def push(self, rows):
+            raise PlatformUnavailableError("circuit open")
+    monkeypatch.setattr(platform_push, "_client", UnavailablePlatform())
+
+    messages = [message({"merged_payload": payload}, str(i)) for i, payload in enumerate(payloads[:3])]
+    body, status = post_batch(make_handler(), messages)
+
+    assert status == 202
+    assert body == {"error": "circuit open", "scored": 0, "failed": 3}
+    assert sorted(error["message_id"] for error in error_logs()) == ["0", "1", "2"]
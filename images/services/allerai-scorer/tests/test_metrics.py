@@ -0,0 +1,35 @@
+import base64
+import math
+import orjson
+from flask import Flask
+from prometheus_client.parser import text_string_to_metric_families
+
+
+def request(path: str, method: str = "GET", json=None):
+    import main
+
+    with Flask("test").test_request_context(path, method=method, json=json):
+        from flask import request
+        return main.process_request(request)
+
+
+def samples(text: str) -> dict:
+    return {(sample.name, tuple(sorted(sample.labels.items()))): sample.value
+            for family in text_string_to_metric_families(text) for sample in family.samples}
+
+
+def test_metrics_endpoint_exposes_a_scored_request(reference_data, payloads):
+    articles, _, _ = reference_data
+    data = base64.b64encode(orjson.dumps({"merged_payload": payloads[0]})).decode()
+    _, status = request("/", "POST", {"message": {"messageId": "1", "attributes": {}, "data": data}})
+    assert status == 200
+
+    response = request("/metrics")
+
+    assert response.content_type.startswith("text/plain")
+    metrics = samples(response.get_data(as_text=True))
+    assert metrics[("scorer_request_duration_seconds_count", (("endpoint", "push"), ("status", "success")))] >= 1
+    assert metrics[("scorer_stage_duration_seconds_count", (("endpoint", "push"), ("stage", "similarity")))] >= 1
+    assert metrics[("scorer_pubsub_messages_total", (("result", "published"), ("topic", "allerai-scorer-events-push")))] >= 1
+    assert metrics[("scorer_snapshot_articles", ())] == len(articles)
+    assert math.isfinite(metrics[("scorer_cache_age_seconds", ())])
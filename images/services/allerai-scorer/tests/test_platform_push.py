@@ -0,0 +1,107 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from platform_push import PlatformClient, PlatformUnavailableError
+
+
+class StubPlatform:
+    # Local HTTP server answering each POST with the next status in `statuses` (the last one repeats)
+    def __init__(self, statuses: list, delay_seconds: float = 0):
+        self.statuses = list(statuses)
+        self.delay = delay_seconds
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                stub.requests += 1
+                status = stub.statuses.pop(0) if len(stub.statuses) > 1 else stub.statuses[0]
+                time.sleep(stub.delay)
+                self.send_response(status)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/scores"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def platform():
+    stubs = []
+
+    def start(statuses, delay_seconds=0):
+        stubs.append(StubPlatform(statuses, delay_seconds))
+        return stubs[-1]
+    yield start
+    for stub in stubs:
+        stub.close()
+
+
+def client(url: str, **kwargs) -> PlatformClient:
+    kwargs = {"retries": 0, "backoff_factor": 0, "failure_threshold": 2, "reset_timeout_seconds": 0.2, **kwargs}
+    return PlatformClient(url, "test-key", **kwargs)
+
+
+def test_retries_on_5xx(platform):
+    stub = platform([503, 502, 200])
+
+    response = client(stub.url, retries=3).send([{"id": "a"}])
+
+    assert response.status_code == 200
+    assert stub.requests == 3
+
+
+def test_open_circuit_rejects_calls(platform):
+    stub = platform([500])
+    platform_client = client(stub.url)
+
+    for _ in range(2):
+        assert platform_client.send([{"id": "a"}]).status_code == 500
+    with pytest.raises(PlatformUnavailableError):
+        platform_client.send([{"id": "a"}])
+    assert stub.requests == 2
+
+
+def test_recovers_after_reset_timeout(platform):
+    stub = platform([500, 500, 200, 500, 200])
+    platform_client = client(stub.url)
+    for _ in range(2):
+        platform_client.send([{"id": "a"}])
+
+    time.sleep(0.25)
+    assert platform_client.send([{"id": "a"}]).status_code == 200
+    # The successful probe closed the circuit, a single failure no longer opens it
+    assert platform_client.send([{"id": "a"}]).status_code == 500
+    assert platform_client.send([{"id": "a"}]).status_code == 200
+    assert stub.requests == 5
+
+
+def test_half_open_lets_a_single_probe_through(platform):
+    stub = platform([500, 500, 500], delay_seconds=0.3)
+    platform_client = client(stub.url)
+    for _ in range(2):
+        platform_client.send([{"id": "a"}])
+    time.sleep(0.25)
+
+    probe = threading.Thread(target=platform_client.send, args=([{"id": "probe"}],))
+    probe.start()
+    time.sleep(0.1)
+    with pytest.raises(PlatformUnavailableError):
+        platform_client.send([{"id": "b"}])
+    probe.join()
+
+    # The probe failed, so the circuit is open again
+    with pytest.raises(PlatformUnavailableError):
+        platform_client.send([{"id": "c"}])
+    assert stub.requests == 3
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import data_access
+from conftest import DIM, SITES, TAGS_PER_SITE
+from features.context import FeatureContext
+from features.potential import PotentialScorer
+from synthetic import make_event_payloads
+
+
+# Per-site pandas loop as PotentialScorer did it before the article matrix existed
+def legacy_predict_classification(df_events, df_articles, N=25):
+    df_articles = df_articles.dropna(subset=["pageviews_first_7_days"])
+    site_quartiles = df_articles.groupby("site_domain")["pageviews_first_7_days"].quantile([0.25, 0.5, 0.75]).unstack()
+    site_quartiles.columns = ["Q1", "Q2", "Q3"]
+
+    df_articles = df_articles.dropna(subset=["embeddings_en"]).copy()
+    article_embeddings = np.array(df_articles["embeddings_en"].tolist())
+    article_embeddings /= np.linalg.norm(article_embeddings, axis=1, keepdims=True)
+
+    results = []
+    for _, event in df_events.iterrows():
+        embedding = np.array(event["embeddings_en"])
+        df_articles["similarity_score"] = article_embeddings @ (embedding / np.linalg.norm(embedding))
+        top_similar = (
+            df_articles.sort_values(["site_domain", "similarity_score"], ascending=[True, False])
+            .groupby("site_domain")
+            .head(N)
+        )
+        for site, site_articles in top_similar.groupby("site_domain"):
+            pageviews = site_articles["pageviews_first_7_days"]
+            std = pageviews.std()
+            median = pageviews.median()
+            calc = std - median * 2
+            conditions = [pageviews > std, (pageviews <= std) & (pageviews > calc), pageviews <= calc]
+            weights = [cond.sum() / len(site_articles) for cond in conditions]
+            median_weighted = pd.Series(np.select(conditions, [pageviews * w for w in weights])).median()
+
+            Q1, Q2, Q3 = site_quartiles.loc[site]
+            closest = np.argmin([abs(median_weighted - Q1), abs(median_weighted - Q2), abs(median_weighted - Q3)]) + 1
+            center, iq_dist = {1: (Q1, Q2 - Q1), 2: (Q2, Q3 - Q1), 3: (Q3, Q3 - Q2)}[closest]
+            results.append({
+                "id": event["article_id"],
+                "site_domain": site,
+                "potential_quartile": closest,
+                "pageview_range": [int(center - 0.25 * iq_dist), int(center + 0.25 * iq_dist)]
+            })
+    return pd.DataFrame(results)
+
+
+def test_potential_matches_the_per_site_pandas_version(make_handler, reference_data, monkeypatch):
+    articles, _, traffic = reference_data
+    # One site with a single article with traffic and one without any
+    single = traffic[traffic["site_domain"] == "site1.no"].head(1)
+    traffic = pd.concat([traffic[traffic["site_domain"] == "dagbladet.no"], single], ignore_index=True)
+    monkeypatch.setattr(data_access.DataManager, "_fetch_traffic_data", lambda self, since=None: traffic.copy())
+
+    payloads = make_event_payloads(50, DIM, 100, SITES, TAGS_PER_SITE)
+    handler = make_handler()
+    snapshot = handler.data_manager.get_snapshot()
+    events = handler.request_parser.payloads_to_events(payloads)
+
+    result = PotentialScorer().predict_classification(FeatureContext(events, snapshot))
+
+    df_events = pd.DataFrame({"article_id": [p["article_id"] for p in payloads],
+                              "embeddings_en": [p["embeddings_en"] for p in payloads]})
+    df_articles = articles.merge(traffic, on=["article_id", "site_domain"], how="left").astype({"pageviews_first_7_days": float})
+    expected = legacy_predict_classification(df_events, df_articles)
+    assert set(expected["site_domain"]) == {"dagbladet.no", "site1.no"}
+    assert set(expected["potential_quartile"]) >= {1, 2}
+    key = ["id", "site_domain"]
+    pd.testing.assert_frame_equal(
+        result.sort_values(key).reset_index(drop=True).astype({"id": str, "site_domain": str}),
+        expected.sort_values(key).reset_index(drop=True).astype({"id": str, "site_domain": str}),
+        check_dtype=False
+    )
@@ -0,0 +1,56 @@
+import orjson
+from prometheus_client import REGISTRY
+from pubsub import PubSubService
+
+
+def failed_publishes(topic: str) -> float:
+    return REGISTRY.get_sample_value("scorer_pubsub_messages_total", {"topic": topic, "result": "failed"}) or 0
+
+
+def test_batching_and_flow_control_settings_are_applied():
+    service = PubSubService("test-project", "scores", max_messages=10, max_bytes=2048, max_latency_seconds=0.5,
+                            max_outstanding_messages=20, max_outstanding_bytes=4096)
+
+    settings = service.publisher.batch_settings
+    assert (settings.max_messages, settings.max_bytes, settings.max_latency) == (10, 2048, 0.5)
+    flow_control = service.publisher.publisher_options.flow_control
+    assert (flow_control.message_limit, flow_control.byte_limit) == (20, 4096)
+    assert service.topic_path == "projects/test-project/topics/scores"
+
+
+def test_published_future_is_counted():
+    service = PubSubService("test-project", "scores")
+
+    future = service.publish([{"id": "a", "score": 1.0}], {"event_source": "test"})
+
+    assert future.result() == "1"
+    assert service.published_count == 1 and service.failed_count == 0
+    topic, data, attributes = service.publisher.messages[0]
+    assert orjson.loads(data) == [{"id": "a", "score": 1.0}]
+    assert attributes == {"event_source": "test"}
+
+
+def test_failed_future_calls_on_failure():
+    failures = []
+    service = PubSubService("test-project", "scores", on_failure=lambda *args: failures.append(args))
+    service.publisher.fail_topics.add(service.topic_path)
+    failed_before = failed_publishes("scores")
+
+    service.publish([{"id": "a"}], {"event_source": "test"})
+
+    assert service.failed_count == 1
+    assert failed_publishes("scores") == failed_before + 1
+    (message, attributes, error), = failures
+    assert message == [{"id": "a"}] and attributes == {"event_source": "test"}
+    assert "failed" in str(error)
+
+
+def test_failed_score_publish_goes_to_the_error_topic(make_handler):
+    handler = make_handler()
+    handler.pubsub_service.publisher.fail_topics.add(handler.pubsub_service.topic_path)
+
+    handler.pubsub_service.publish([{"id": "dagbladet.no:a"}], {})
+
+    topic, data, _ = handler.pubsub_service_error_log.publisher.messages[-1]
+    assert topic.endswith("/errors")
+    assert orjson.loads(data)["article_id"] == "dagbladet.no:a"
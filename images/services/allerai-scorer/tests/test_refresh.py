@@ -0,0 +1,122 @@
+import pandas as pd
+import pytest
+from google.api_core.exceptions import NotFound
+import data_access
+from synthetic import make_articles, make_tag_scores, make_traffic
+
+SITES, ARTICLES_PER_SITE, DIM = 2, 20, 16
+
+
+class FakeBigQuery:
+    # Answers the articles and traffic queries from DataFrames, applying the bound @since like BigQuery would
+    def __init__(self, articles: pd.DataFrame, traffic: pd.DataFrame):
+        self.articles = articles
+        self.traffic = traffic
+        self.rollup_exists = True
+        self.queries = []
+
+    def query(self, sql, job_config=None):
+        self.queries.append((sql, job_config))
+        articles = self.articles
+        parameters = {p.name: p.value for p in job_config.query_parameters} if job_config else {}
+        if "since" in parameters:
+            since = parameters["since"]
+            articles = articles[(articles["published_ts"] >= since) | (articles["updated_ts"] >= since)]
+        articles = articles.sort_values("published_ts", ascending=False).groupby("site_domain").head(ARTICLES_PER_SITE)
+
+        if "pages_pageviews_first_7_days" in sql and not self.rollup_exists:
+            self.rows = NotFound("Not found: Table adp_pageviews.pages_pageviews_first_7_days")
+        elif "pageviews" in sql:
+            self.rows = self.traffic[self.traffic["article_id"].isin(articles["article_id"])]
+        else:
+            self.rows = articles
+        return self
+
+    def result(self):
+        if isinstance(self.rows, Exception):
+            raise self.rows
+        return self
+
+    def to_dataframe(self):
+        return self.rows.copy()
+
+
+@pytest.fixture
+def table(monkeypatch):
+    articles = make_articles(SITES, ARTICLES_PER_SITE, DIM)
+    monkeypatch.setattr(data_access.DataManager, "_fetch_tag_scores", lambda self: make_tag_scores(SITES, 10))
+    return FakeBigQuery(articles, make_traffic(articles))
+
+
+def data_manager(table, refresh_mode):
+    manager = data_access.DataManager("adp", articles_per_site=ARTICLES_PER_SITE, refresh_mode=refresh_mode)
+    manager.client = table
+    return manager
+
+
+def test_watermark_is_bound_as_a_parameter_with_a_lookback(table):
+    manager = data_manager(table, "incremental")
+    manager.refresh_cache()
+    watermark = manager.get_snapshot().watermark
+
+    manager.refresh_cache()
+
+    sql, job_config = table.queries[-1]
+    assert "@since" in sql and watermark.isoformat() not in sql
+    (parameter,) = job_config.query_parameters
+    assert (parameter.name, parameter.type_) == ("since", "TIMESTAMP")
+    assert parameter.value == watermark - data_access.WATERMARK_LOOKBACK
+
+
+def test_incremental_refresh_picks_up_late_rows(table):
+    manager = data_manager(table, "incremental")
+    manager.refresh_cache()
+    watermark = manager.get_snapshot().watermark
+
+    # Published just before the watermark but only loaded into BigQuery after the last refresh
+    late = make_articles(SITES, 1, DIM, seed=1).assign(
+        article_id=lambda df: "late-" + df["article_id"],
+        published_ts=watermark - pd.Timedelta(minutes=5),
+        updated_ts=watermark - pd.Timedelta(minutes=5)
+    )
+    table.articles = pd.concat([table.articles, late], ignore_index=True)
+    manager.refresh_cache()
+    incremental = manager.get_snapshot().articles
+
+    full = data_manager(table, "full")
+    full.refresh_cache()
+    expected = full.get_snapshot().articles
+
+    assert set(late["article_id"]) <= set(incremental["article_id"])
+    assert not incremental.duplicated(["article_id", "site_domain"]).any()
+    assert sorted(incremental["article_id"]) == sorted(expected["article_id"])
+
+
+def traffic_queries(table) -> list:
+    return [(sql, job_config) for sql, job_config in table.queries if "pageviews" in sql]
+
+
+def test_traffic_is_selected_with_a_join(table):
+    manager = data_manager(table, "incremental")
+    manager.refresh_cache()
+    manager.refresh_cache()
+
+    (full_sql, full_config), (incremental_sql, incremental_config) = traffic_queries(table)
+    assert "editorial.pages" in full_sql and full_config is None
+    assert "@since" in incremental_sql
+    assert [type(p).__name__ for p in incremental_config.query_parameters] == ["ScalarQueryParameter"]
+    expected = table.traffic["pageviews_first_7_days"].sum()
+    assert manager.get_snapshot().articles["pageviews_first_7_days"].sum() == expected
+
+
+def test_missing_rollup_falls_back_to_aggregating_pageviews(table):
+    table.rollup_exists = False
+    manager = data_manager(table, "full")
+
+    manager.refresh_cache()
+
+    rollup_sql, fallback_sql = [sql for sql, _ in traffic_queries(table)]
+    assert "pages_pageviews_first_7_days" in rollup_sql
+    assert "SUM(pageview_count)" in fallback_sql and "editorial.pages" in fallback_sql
+    expected = table.traffic["pageviews_first_7_days"].sum()
+    assert manager.get_snapshot().articles["pageviews_first_7_days"].sum() == expected
@@ -0,0 +1,134 @@
+import threading
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+from google.cloud import storage
+import data_access
+import snapshot
+import vector_index
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+
+    def upload_from_filename(self, filename):
+        self.bucket.blobs[self.name] = Path(filename).read_bytes()
+
+    def upload_from_string(self, data):
+        self.bucket.blobs[self.name] = data.encode()
+
+    def exists(self):
+        return self.name in self.bucket.blobs
+
+    def download_as_text(self):
+        return self.bucket.blobs[self.name].decode()
+
+    def download_to_filename(self, filename):
+        Path(filename).write_bytes(self.bucket.blobs[self.name])
+
+
+class FakeBucket:
+    # In-memory stand-in for a GCS bucket, blobs by name
+    def __init__(self):
+        self.blobs = {}
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def list_blobs(self, prefix=""):
+        return [FakeBlob(self, name) for name in self.blobs if name.startswith(prefix)]
+
+    def delete_blobs(self, blobs, on_error=None):
+        for blob in blobs:
+            self.blobs.pop(blob.name)
+
+
+class FakeStorageClient:
+    def __init__(self, bucket):
+        self._bucket = bucket
+
+    def bucket(self, name):
+        return self._bucket
+
+
+def score(handler, payloads):
+    events = handler.request_parser.payloads_to_events(payloads)
+    base_domains = [handler.base_domain(event.site_domain) for event in events]
+    return handler.score_events(events, base_domains).sort_values(["id", "site_domain"]).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("index", ["flat", "ivf"])
+def test_persisted_snapshot_scores_like_the_refreshed_one(make_handler, payloads, tmp_path, monkeypatch, index):
+    # tmp_path stands in for the GCS bucket
+    handler = make_handler(snapshot_uri=str(tmp_path), vector_index=index, ivf_probes=2)
+    expected = score(handler, payloads)
+    handler.data_manager.wait_for_persist()
+    assert (tmp_path / "LATEST").exists()
+
+    # A cold instance with BigQuery down still scores from the persisted snapshot
+    def unavailable(self, *args, **kwargs):
+        raise RuntimeError("BigQuery unavailable")
+    monkeypatch.setattr(data_access.DataManager, "_fetch_articles", unavailable)
+    # and loads the persisted IVF clusters instead of training new ones
+    monkeypatch.setattr(vector_index.IVFIndex, "train", unavailable)
+    cold = make_handler(snapshot_uri=str(tmp_path), vector_index=index, ivf_probes=2)
+
+    assert cold.data_manager._snapshot is not None
+    assert cold.data_manager._snapshot.vector_index.kind == index
+    pd.testing.assert_frame_equal(score(cold, payloads), expected)
+
+
+def test_persisted_ivf_snapshot_served_flat_when_configured_flat(make_handler, payloads, tmp_path, monkeypatch):
+    handler = make_handler(snapshot_uri=str(tmp_path), vector_index="ivf")
+    persisted = handler.data_manager.get_snapshot().vector_index
+    handler.data_manager.wait_for_persist()
+
+    def unavailable(self, *args, **kwargs):
+        raise RuntimeError("BigQuery unavailable")
+    monkeypatch.setattr(data_access.DataManager, "_fetch_articles", unavailable)
+    cold = make_handler(snapshot_uri=str(tmp_path), vector_index="flat")
+
+    loaded = cold.data_manager._snapshot
+    assert loaded.vector_index.kind == "flat"
+    np.testing.assert_array_equal(loaded.article_matrix.article_ids, persisted.article_matrix.article_ids)
+    assert len(score(cold, payloads)) > 0
+
+
+def test_persisting_does_not_block_the_first_load(make_handler, payloads, tmp_path, monkeypatch):
+    saved = []
+    release = threading.Event()
+
+    def slow_save(self, cache_snapshot):
+        release.wait(5)
+        saved.append(cache_snapshot.version)
+    monkeypatch.setattr(snapshot.LocalSnapshotStore, "save", slow_save)
+
+    handler = make_handler(snapshot_uri=str(tmp_path))
+    score(handler, payloads)
+    assert saved == []
+
+    release.set()
+    handler.data_manager.wait_for_persist()
+    assert saved == [1]
+
+
+def test_gcs_store_keeps_only_the_latest_snapshot(make_handler, payloads, tmp_path, monkeypatch):
+    bucket = FakeBucket()
+    monkeypatch.setattr(storage, "Client", lambda *args, **kwargs: FakeStorageClient(bucket))
+
+    handler = make_handler(snapshot_uri="gs://snapshots/scorer")
+    handler.data_manager.get_snapshot()
+    handler.data_manager.wait_for_persist()
+    first = bucket.blobs["scorer/LATEST"].decode()
+
+    handler.data_manager.refresh_cache()
+    handler.data_manager.wait_for_persist()
+    latest = bucket.blobs["scorer/LATEST"].decode()
+
+    assert latest != first
+    assert {name.split("/")[1] for name in bucket.blobs} == {"LATEST", latest}
+    cold = snapshot.GCSSnapshotStore("gs://snapshots/scorer", local_dir=str(tmp_path)).load()
+    assert cold.version == handler.data_manager._snapshot.version
@@ -0,0 +1,119 @@
+from concurrent import futures
+import orjson
+import platform_push
+from platform_push import PlatformUnavailableError
+from subscriber import StreamingSubscriber
+
+
+class FakeMessage:
+    def __init__(self, data: bytes, message_id: str):
+        self.data = data
+        self.attributes = {"event_source": "test"}
+        self.message_id = message_id
+        self.outcome = None
+
+    def ack(self):
+        assert self.outcome is None, f"{self.message_id} settled twice"
+        self.outcome = "ack"
+
+    def nack(self):
+        assert self.outcome is None, f"{self.message_id} settled twice"
+        self.outcome = "nack"
+
+
+class FakeSubscriberClient:
+    # In-memory streaming pull: delivers the messages to the callback, then the stream ends
+    def __init__(self, messages: list):
+        self.messages = messages
+
+    def subscribe(self, subscription, callback, flow_control=None):
+        for message in self.messages:
+            callback(message)
+        stream = futures.Future()
+        stream.set_result(None)
+        return stream
+
+
+def event_message(payload, message_id: str) -> FakeMessage:
+    return FakeMessage(orjson.dumps({"merged_payload": payload}), message_id)
+
+
+def run(handler, messages: list) -> dict:
+    StreamingSubscriber(handler, "projects/test-project/subscriptions/events", FakeSubscriberClient(messages)).run()
+    return {message.message_id: message.outcome for message in messages}
+
+
+def published_ids(publisher) -> set:
+    return {orjson.loads(data)[0]["id"].split(":", 1)[1] for _, data, _ in publisher.messages}
+
+
+def test_poison_messages_do_not_hold_up_the_batch(make_handler, payloads):
+    handler = make_handler()
+    wrong_dimension = dict(payloads[3], article_id="wrong-dimension", embeddings_en=payloads[3]["embeddings_en"][:-1])
+    messages = [event_message(payload, str(i)) for i, payload in enumerate(payloads[:3])] + [
+        event_message(wrong_dimension, "wrong-dimension"),
+        FakeMessage(b"[1]", "not-an-object"),
+        FakeMessage(b"{", "not-json")
+    ]
+
+    outcomes = run(handler, messages)
+
+    assert set(outcomes.values()) == {"ack"}
+    assert published_ids(handler.pubsub_service.publisher) == {payload["article_id"] for payload in payloads[:3]}
+    assert len(handler.pubsub_service_error_log.publisher.messages) == 3
+
+
+def test_redelivered_duplicate_is_acked(make_handler, payloads):
+    handler = make_handler()
+    messages = [event_message(payloads[0], "1"), event_message(payloads[1], "2"), event_message(payloads[0], "1")]
+
+    run(handler, messages)
+
+    assert [message.outcome for message in messages] == ["ack", "ack", "ack"]
+    assert len(handler.pubsub_service.publisher.messages) == 2
+
+
+def test_failed_publish_nacks_only_its_message(make_handler, payloads):
+    handler = make_handler()
+    publish = handler.pubsub_service.publish
+
+    def publish_failing_one(rows, attributes):
+        if rows[0]["id"].endswith(payloads[1]["article_id"]):
+            future = futures.Future()
+            future.set_exception(RuntimeError("publish failed"))
+            return future
+        return publish(rows, attributes)
+    handler.pubsub_service.publish = publish_failing_one
+
+    outcomes = run(handler, [event_message(payload, str(i)) for i, payload in enumerate(payloads[:3])])
+
+    assert outcomes == {"0": "ack", "1": "nack", "2": "ack"}
+
+
+def test_scoring_failure_nacks_the_valid_messages(make_handler, payloads, monkeypatch):
+    handler = make_handler()
+
+    def fail(*args):
+        raise RuntimeError("scoring failed")
+    monkeypatch.setattr(handler, "score_batch", fail)
+
+    outcomes = run(handler, [event_message(payloads[0], "valid"), FakeMessage(b"[1]", "invalid")])
+
+    assert outcomes == {"valid": "nack", "invalid": "ack"}
+
+
+def test_platform_failure_acks_published_messages(make_handler, payloads, monkeypatch):
+    handler = make_handler()
+
+    class UnavailablePlatform:
+        def push(self, rows):
+            raise PlatformUnavailableError("circuit open")
+    monkeypatch.setattr(platform_push, "_client", UnavailablePlatform())
+
+    outcomes = run(handler, [event_message(payload, str(i)) for i, payload in enumerate(payloads[:3])])
+
+    assert outcomes == {"0": "ack", "1": "ack", "2": "ack"}
+    assert published_ids(handler.pubsub_service.publisher) == {payload["article_id"] for payload in payloads[:3]}
+    errors = [orjson.loads(data) for _, data, _ in handler.pubsub_service_error_log.publisher.messages]
+    assert sorted(error["message_id"] for error in errors) == ["0", "1", "2"]
+    assert all("circuit open" in error["error"] for error in errors)
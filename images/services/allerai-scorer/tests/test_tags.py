@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+from features.context import FeatureContext
+from features.tag_matcher import TagMatcher
+from features.tags import TagScorer
+from parsers import Event
+
+TAG_SCORES = pd.DataFrame({
+    "site": ["a.no", "b.no"],
+    "tag": ["Ola", "Kari Nordmann"],
+    "frequency": [5, 10],
+    "total_articles": [100, 100],
+    "max_frequency": [10, 10],
+    "tag_type": ["PERSON", "PERSON"]
+})
+
+
+def tag_scores(scorer: TagScorer, text: str) -> list:
+    snapshot = SimpleNamespace(tag_matcher=TagMatcher.from_dataframe(TAG_SCORES))
+    context = FeatureContext([Event("e1", "a.no", np.zeros(2, dtype=np.float32), bodytext_en=text)], snapshot)
+    return scorer.tag_relevance(context)["tag_score"].tolist()
+
+
+def test_substring_matching_by_default():
+    assert tag_scores(TagScorer(), "Kola and kari nordmann.") == [0.5, 1.0]
+
+
+def test_word_boundaries():
+    assert tag_scores(TagScorer(word_boundaries=True), "Kola and kari nordmann.") == [0.0, 1.0]
+    assert tag_scores(TagScorer(word_boundaries=True), "Ola, Kari Nordmann") == [0.5, 1.0]
+
+
+def test_word_boundaries_reach_the_handler(make_handler):
+    assert make_handler(tag_word_boundaries=True).tag_scorer.word_boundaries
+    assert not make_handler().tag_scorer.word_boundaries